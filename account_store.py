@@ -0,0 +1,62 @@
+import os
+import sqlite3
+
+ACCOUNT_FIELDS = ('user', 'dp', 'username', 'password', 'crn', 'pin')
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+
+def is_account_store(path):
+    return path.endswith(SQLITE_EXTENSIONS)
+
+
+class AccountStore:
+    """
+    SQLite alternative to accounts.csv for large account files. Accounts are keyed by `user`, so looking up a single
+    user doesn't scan the whole file.
+    """
+
+    def __init__(self, path, create=False):
+        """
+        :param create: create the store when it doesn't exist yet, otherwise a missing store is an error
+        """
+        if not os.path.exists(path):
+            if not create:
+                raise FileNotFoundError(f"Account store not found: {path}")
+            # the store holds passwords and PINs, create it readable only by the owner
+            os.close(os.open(path, os.O_CREAT | os.O_WRONLY, 0o600))
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS accounts ("
+            "user TEXT PRIMARY KEY, dp TEXT NOT NULL, username TEXT NOT NULL, password TEXT NOT NULL, "
+            "crn TEXT NOT NULL, pin TEXT NOT NULL)"
+        )
+
+    def __iter__(self):
+        for row in self.connection.execute("SELECT * FROM accounts ORDER BY rowid"):
+            yield dict(row)
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM accounts").fetchone()[0]
+
+    def find(self, user):
+        row = self.connection.execute("SELECT * FROM accounts WHERE user = ?", (user,)).fetchone()
+        return dict(row) if row else None
+
+    def save(self, rows):
+        """
+        Inserts the account rows, replacing the existing rows of the same users.
+
+        :return: number of rows saved
+        """
+        with self.connection:
+            cursor = self.connection.executemany(
+                "INSERT OR REPLACE INTO accounts (user, dp, username, password, crn, pin) "
+                "VALUES (:user, :dp, :username, :password, :crn, :pin)",
+                ({field: row[field] for field in ACCOUNT_FIELDS} for row in rows)
+            )
+        return cursor.rowcount
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,118 @@
+"""
+End-to-end benchmark of main.py against the mock MeroShare backend.
+
+    python3 benchmark.py --accounts 1 100 1000 --modes list apply report --latency 0.02 --workers 16
+"""
+import argparse
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from main import Account, IssueCatalog, run_account
+from mock_server import MockBackend, MockServer, mock_accounts
+from profiling import percentile
+from transport import Transport
+
+MODES = ('list', 'apply', 'report')
+
+
+def mode_args(mode, lock_dir):
+    return argparse.Namespace(
+        report=mode == 'report',
+        apply=mode == 'apply',
+        sync_history=False,
+        company_share_id=[1],
+        all_unapplied=False,
+        number_of_shares=10,
+        start_date=None,
+        end_date=None,
+        lock_dir=lock_dir,
+    )
+
+
+def timed_run_account(account, run_args, session_options):
+    start = time.perf_counter()
+    for _ in run_account(account, run_args, session_options):
+        pass
+    return time.perf_counter() - start
+
+
+def run_benchmark(mode, account_count, args):
+    """
+    Runs one mode for `account_count` accounts against a fresh mock backend.
+
+    :return: dict with the wall time, request count and per-account latencies
+    """
+    backend = MockBackend(accounts=account_count, issues=args.issues, applications=args.applications,
+                          latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                          drop_rate=args.drop_rate)
+    accounts = [Account.from_row(row) for row in mock_accounts(account_count)]
+    # apply mode locks every account, never in the lock directory of real runs
+    with MockServer(backend) as server, tempfile.TemporaryDirectory() as lock_dir:
+        transport = Transport(base_url=server.url, pool_size=args.workers * args.detail_workers,
+                              backoff_factor=0.01)
+        session_options = {
+            'transport': transport,
+            'detail_workers': args.detail_workers,
+            'page_size': args.page_size,
+            'catalog': IssueCatalog()
+        }
+        run_args = mode_args(mode, lock_dir)
+        latencies, failures, error = [], 0, None
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            futures = [executor.submit(timed_run_account, account, run_args, session_options) for account in accounts]
+            for future in futures:
+                try:
+                    latencies.append(future.result())
+                except Exception as e:
+                    failures += 1
+                    error = error or e
+        wall_time = time.perf_counter() - start
+        transport.close()
+
+    return {
+        'mode': mode,
+        'accounts': account_count,
+        'wall_time': wall_time,
+        'requests': transport.stats.requests,
+        'latencies': latencies,
+        'failures': failures,
+        'error': error,
+    }
+
+
+def print_result(result):
+    print(f"{result['mode']:<8}{result['accounts']:>9}{result['wall_time']:>10.2f}s{result['requests']:>10}"
+          f"{result['requests'] / result['wall_time']:>10.1f}"
+          f"{percentile(result['latencies'], 50) * 1000:>10.1f}{percentile(result['latencies'], 99) * 1000:>10.1f}"
+          f"{result['failures']:>10}")
+    if result['error']:
+        print(f"  first failure: {result['error']!r}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark main.py against the mock MeroShare backend')
+    parser.add_argument('--accounts', type=int, nargs='+', default=[1, 100, 1000],
+                        help='Account counts to benchmark, default is 1 100 1000')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES),
+                        help='Modes to benchmark, default is all')
+    parser.add_argument('-w', '--workers', type=int, default=16, help='Accounts run concurrently, default is 16')
+    parser.add_argument('--detail-workers', type=int, default=4,
+                        help='Allotment details fetched concurrently per account, default is 4')
+    parser.add_argument('--page-size', type=int, default=20, help='Page size, default is 20')
+    parser.add_argument('--issues', type=int, default=3, help='Number of open issues, default is 3')
+    parser.add_argument('--applications', type=int, default=10,
+                        help='Number of applications per account, default is 10')
+    parser.add_argument('--latency', type=float, default=0.02, help='Mock backend latency in seconds, default is 0.02')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Random +/- seconds added to the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with a 503')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='Fraction of connections closed without a '
+                                                                     'response')
+    args = parser.parse_args()
+
+    print(f"{'mode':<8}{'accounts':>9}{'wall':>11}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}"
+          f"{'failed':>10}")
+    for mode in args.modes:
+        for account_count in args.accounts:
+            print_result(run_benchmark(mode, account_count, args))
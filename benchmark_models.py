@@ -0,0 +1,153 @@
+"""
+Memory and throughput micro-benchmark of the `Issue` model against the previous dict backed implementation.
+
+    python3 benchmark_models.py --issues 100000
+"""
+import argparse
+import gc
+import os
+import time
+import tracemalloc
+from functools import cached_property
+
+from main import Issue
+from mock_server import MockBackend
+
+
+class LegacyIssue:
+    """
+    `main.Issue` before it was a slotted dataclass, kept as the baseline of the benchmark.
+    """
+
+    def __init__(self, json_data, action=None):
+        self._json_data = json_data
+        self._action = action
+
+    def __str__(self):
+        return (
+            "******   COMPANY SHARE ID: {company_share_id}    ******{sep}{share_type} ({share_group}) - {subgroup}"
+            " ({symbol}) - {name}{sep}{open_date} - {close_date}{sep}{status}{sep}"
+            .format(
+                sep=os.linesep,
+                company_share_id=self.company_share_id,
+                name=self.company_name,
+                subgroup=self.subgroup,
+                symbol=self.scrip,
+                open_date=self.issue_open_date,
+                close_date=self.issue_close_date,
+                share_type=self.share_type_name,
+                share_group=self.share_group_name,
+                status=self.status.capitalize())
+        )
+
+    @property
+    def is_unapplied_ordinary_share(self):
+        return self.is_ordinary_shares and not self.is_applied
+
+    @property
+    def is_ipo(self):
+        return True if self.share_type_name == 'IPO' else False
+
+    @property
+    def is_fpo(self):
+        return True if self.share_type_name == 'FPO' else False
+
+    @property
+    def is_ordinary_shares(self):
+        return True if self.share_group_name == 'Ordinary Shares' else False
+
+    @property
+    def status(self):
+        return "applied" if self.is_applied else "not applied"
+
+    @property
+    def is_applied(self):
+        return True if self.action == "edit" else False
+
+    @cached_property
+    def company_share_id(self):
+        return self._json_data.get("companyShareId")
+
+    @cached_property
+    def subgroup(self):
+        return self._json_data.get("subGroup")
+
+    @cached_property
+    def scrip(self):
+        return self._json_data.get("scrip")
+
+    @cached_property
+    def company_name(self):
+        return self._json_data.get("companyName")
+
+    @cached_property
+    def share_type_name(self):
+        return self._json_data.get("shareTypeName")
+
+    @cached_property
+    def share_group_name(self):
+        return self._json_data.get("shareGroupName")
+
+    @cached_property
+    def status_name(self):
+        return self._json_data.get("statusName")
+
+    @cached_property
+    def action(self):
+        return self._action or self._json_data.get("action")
+
+    @cached_property
+    def issue_open_date(self):
+        return self._json_data.get("issueOpenDate")
+
+    @cached_property
+    def issue_close_date(self):
+        return self._json_data.get("issueCloseDate")
+
+
+def issue_payloads(count):
+    issues = MockBackend(accounts=0, issues=10).issues
+    return [{**issues[i % len(issues)], "companyShareId": i, "action": "edit" if i % 2 else None}
+            for i in range(count)]
+
+
+def measure(name, build, payloads, rounds):
+    """
+    Builds an issue per payload and runs the status checks used when listing and applying `rounds` times over them,
+    then measures the memory the issues keep alive, like a long-running snapshot would.
+    """
+    gc.collect()
+    start = time.perf_counter()
+    issues = [build(payload) for payload in payloads]
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for issue in issues:
+            _ = issue.is_unapplied_ordinary_share, issue.is_ipo, issue.company_share_id
+    check_time = time.perf_counter() - start
+    del issues
+
+    gc.collect()
+    tracemalloc.start()
+    issues = [build(payload) for payload in payloads]
+    for issue in issues:
+        _ = issue.is_unapplied_ordinary_share, issue.is_ipo, issue.company_share_id
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:<12}{memory / len(issues):>12.0f}{len(issues) / build_time:>14.0f}"
+          f"{len(issues) * rounds / check_time:>14.0f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the Issue model')
+    parser.add_argument('--issues', type=int, default=100000, help='Number of issues, default is 100000')
+    parser.add_argument('--rounds', type=int, default=5, help='Status check rounds over all issues, default is 5')
+    args = parser.parse_args()
+
+    # the raw payloads are not counted, only what each model keeps on top of them
+    payloads = issue_payloads(args.issues)
+    print(f"{'model':<12}{'bytes/issue':>12}{'builds/s':>14}{'checks/s':>14}")
+    measure('legacy', lambda payload: LegacyIssue(dict(payload)), payloads, args.rounds)
+    measure('slots', Issue.from_json, payloads, args.rounds)
@@ -0,0 +1,77 @@
+"""
+Startup time benchmark of main.py: wall time of invocations that don't need the network and the imports they pay
+for, as reported by `python -X importtime`.
+
+    python3 benchmark_startup.py --runs 20
+"""
+import argparse
+import csv
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from mock_server import mock_accounts
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+
+
+def commands(directory):
+    accounts_path = os.path.join(directory, 'accounts.csv')
+    with open(accounts_path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=mock_accounts(1)[0].keys())
+        writer.writeheader()
+        writer.writerows(mock_accounts(100))
+
+    return {
+        'help': ['-h'],
+        'check-accounts': ['--check-accounts', '--accounts', accounts_path],
+        'history-stats': ['--history-stats', 'account', '--history-db', os.path.join(directory, 'history.db')],
+    }
+
+
+def wall_times(args, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, MAIN, *args], stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def import_times(args):
+    """
+    :return: tuple of (dict of top level module -> cumulative import time in microseconds, set of every module
+             imported)
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', MAIN, *args], stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True, check=True)
+    modules, imported = {}, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        imported.add(name.strip())
+        # nested imports are indented under the module importing them
+        if not name[1:].startswith(' '):
+            modules[name.strip()] = int(cumulative)
+    return modules, imported
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the startup time of main.py')
+    parser.add_argument('--runs', type=int, default=10, help='Runs per command, default is 10')
+    parser.add_argument('--top', type=int, default=5, help='Slowest top level imports to list, default is 5')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, command in commands(directory).items():
+            times = wall_times(command, args.runs)
+            modules, imported = import_times(command)
+            print(f"{name}: median {statistics.median(times) * 1000:.1f} ms, min {min(times) * 1000:.1f} ms, "
+                  f"imports {sum(modules.values()) / 1000:.1f} ms, requests imported: "
+                  f"{'yes' if 'requests' in imported else 'no'}")
+            for module, cumulative in sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+                print(f"    {module:<32}{cumulative / 1000:>8.1f} ms")
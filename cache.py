@@ -0,0 +1,145 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+import constants
+
+
+class JsonFileCache:
+    """
+    Small JSON file backed key-value store. The file and its directory are only readable by the owner and every write
+    replaces the file atomically, so concurrent runs never see a half written cache. Changes are kept in memory and
+    written in batches of `FLUSH_ENTRIES` or every `FLUSH_INTERVAL` seconds, call `flush` at the end of a run to write
+    the rest.
+    """
+
+    FLUSH_ENTRIES = 100
+    FLUSH_INTERVAL = 5
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = None
+        # key -> value changed since the last flush, None for deleted keys
+        self._pending = {}
+        self._flushed_at = time.monotonic()
+
+    def _read(self):
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write(self, data):
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            os.fchmod(fd, 0o600)
+            with os.fdopen(fd, 'w') as file:
+                json.dump(data, file)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _loaded(self):
+        if self._data is None:
+            self._data = self._read()
+        return self._data
+
+    def _changed(self, items):
+        self._pending.update(items)
+        if len(self._pending) >= self.FLUSH_ENTRIES or time.monotonic() - self._flushed_at >= self.FLUSH_INTERVAL:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        # re-read before writing to keep the entries written by other runs in the meantime
+        data = self._read()
+        for key, value in self._pending.items():
+            if value is None:
+                data.pop(key, None)
+            else:
+                data[key] = value
+        self._write(data)
+        self._data = data
+        self._pending = {}
+        self._flushed_at = time.monotonic()
+
+    def get(self, key):
+        with self._lock:
+            return self._loaded().get(key)
+
+    def update(self, items):
+        with self._lock:
+            self._loaded().update(items)
+            self._changed(items)
+
+    def set(self, key, value):
+        self.update({key: value})
+
+    def delete(self, key):
+        with self._lock:
+            self._loaded().pop(key, None)
+            self._changed({key: None})
+
+    def flush(self):
+        """
+        Writes the changes not written yet.
+        """
+        with self._lock:
+            self._flush()
+
+
+class SessionCache(JsonFileCache):
+    """
+    Caches the `Authorization` header and the branch info of each account for `ttl` seconds.
+    """
+
+    def __init__(self, path=constants.SESSION_CACHE_PATH, ttl=constants.SESSION_CACHE_TTL):
+        super().__init__(path)
+        self.ttl = ttl
+
+    @staticmethod
+    def key(account):
+        return f"{account.client_id}:{account.username}"
+
+    def get(self, account):
+        entry = super().get(self.key(account))
+        if entry and time.time() - entry['created_at'] < self.ttl:
+            return entry
+        return None
+
+    def set(self, account, authorization, branch_info):
+        super().set(self.key(account), {
+            'authorization': authorization,
+            'branch_info': branch_info,
+            'created_at': time.time()
+        })
+
+    def invalidate(self, account):
+        self.delete(self.key(account))
+
+
+class AllotmentCache(JsonFileCache):
+    """
+    Caches the allotment status of applicant forms by `applicantFormId`. Only final statuses are stored, an allotment
+    result never changes once it has been published.
+    """
+
+    def __init__(self, path=constants.ALLOTMENT_CACHE_PATH):
+        super().__init__(path)
+
+    def get(self, application_id):
+        return super().get(str(application_id))
+
+    def update(self, statuses):
+        final = {str(application_id): status for application_id, status in statuses.items()
+                 if status in constants.FINAL_ALLOTMENT_STATUSES}
+        if final:
+            super().update(final)
@@ -1,5 +1,13 @@
 SHARES = 10
 ACCOUNTS_CSV_PATH = 'accounts.csv'
+API_BASE_URL = 'https://webbackend.cdsc.com.np/api/meroShare'
+SESSION_CACHE_PATH = '.cache/sessions.json'
+SESSION_CACHE_TTL = 15 * 60
+ALLOTMENT_CACHE_PATH = '.cache/allotments.json'
+FINAL_ALLOTMENT_STATUSES = ('Alloted', 'Not Alloted')
+APPROVED_APPLICATION_STATUSES = ('TRANSACTION_SUCCESS', 'APPROVED')
+HISTORY_DB_PATH = 'history.db'
+LOCK_DIRECTORY = '.cache/locks'
 CAPITALS = [{"code": "19000", "id": 1287, "name": "AAKASH CAPITAL LIMITED"},
             {"code": "20600", "id": 1315, "name": "AAKASHBHAIRAB SECURITIES LIMITED"},
             {"code": "13200", "id": 128, "name": "ABC SECURITIES PRIVATE LIMITED"},
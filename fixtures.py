@@ -0,0 +1,138 @@
+import json
+import threading
+from collections import defaultdict
+
+from requests import Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+REDACTED = 'REDACTED'
+# request and response fields never written to a fixture file
+SECRET_KEYS = ('password', 'transactionPIN', 'crnNumber')
+
+
+def redact(data):
+    """
+    :return: a copy of the JSON data with the `SECRET_KEYS` replaced at any depth
+    """
+    if isinstance(data, dict):
+        return {key: REDACTED if key in SECRET_KEYS else redact(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [redact(value) for value in data]
+    return data
+
+
+def json_or_text(body):
+    if isinstance(body, bytes):
+        body = body.decode('utf-8', errors='replace')
+    if not body:
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        return body
+
+
+def request_key(method, path, authorization, body):
+    """
+    :return: key a request is matched to its recorded response by, with the secrets of the body redacted
+    """
+    return method, path.lstrip('/'), authorization, json.dumps(redact(json_or_text(body)), sort_keys=True)
+
+
+class FixtureRecorder:
+    """
+    Appends every request the `Transport` sends with its response as a JSON line to `path`, credentials, CRNs and PINs
+    redacted. Authorization tokens are replaced by a placeholder per token, so the replayed requests of every account
+    still get that account's responses.
+    """
+
+    def __init__(self, path):
+        # placeholders are only unique within a recording, never append to an older one
+        self.file = open(path, 'w')
+        self.tokens = {}
+        self._lock = threading.Lock()
+
+    def placeholder(self, token):
+        if token is None:
+            return None
+        with self._lock:
+            return self.tokens.setdefault(token, f"{REDACTED}-{len(self.tokens) + 1}")
+
+    def record(self, method, path, response):
+        headers = {'Content-Type': response.headers.get('Content-Type')}
+        if 'Authorization' in response.headers:
+            headers['Authorization'] = self.placeholder(response.headers['Authorization'])
+        fixture = {
+            'method': method,
+            'path': path.lstrip('/'),
+            'authorization': self.placeholder(response.request.headers.get('Authorization')),
+            'body': redact(json_or_text(response.request.body)),
+            'status': response.status_code,
+            'headers': headers,
+            'response': redact(json_or_text(response.content))
+        }
+        with self._lock:
+            self.file.write(json.dumps(fixture) + '\n')
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Serves the responses of a fixture file instead of sending the requests. A request gets the responses recorded for
+    the same method, path, authorization placeholder and body in order, the last one repeated once they run out.
+    Requests whose body differs from the recorded ones, e.g. report date ranges, fall back to the responses recorded
+    for the same method, path and authorization, then for the same method and path. Unknown requests get a 404.
+    """
+
+    def __init__(self, path, base_url):
+        super().__init__()
+        self.base_url = base_url.rstrip('/')
+        self.responses = defaultdict(list)
+        self.served = defaultdict(int)
+        self._lock = threading.Lock()
+        with open(path) as file:
+            for line in file:
+                if line.strip():
+                    fixture = json.loads(line)
+                    body = json.dumps(fixture['body']) if fixture['body'] is not None else None
+                    key = request_key(fixture['method'], fixture['path'], fixture['authorization'], body)
+                    for length in (4, 3, 2):
+                        self.responses[key[:length]].append(fixture)
+
+    def next_fixture(self, key):
+        """
+        :return: the next recorded response for the most specific prefix of the key, None when there is none
+        """
+        for length in (4, 3, 2):
+            fixtures = self.responses.get(key[:length])
+            if fixtures:
+                with self._lock:
+                    index = self.served[key[:length]]
+                    self.served[key[:length]] += 1
+                return fixtures[min(index, len(fixtures) - 1)]
+        return None
+
+    def send(self, request, **kwargs):
+        path = request.url[len(self.base_url):].lstrip('/')
+        fixture = self.next_fixture(request_key(request.method, path, request.headers.get('Authorization'),
+                                                request.body))
+        if fixture is None:
+            fixture = {'status': 404, 'headers': {'Content-Type': 'application/json'},
+                       'response': {'message': f"{request.method} {path} not found in the fixtures"}}
+
+        response = Response()
+        response.status_code = fixture['status']
+        response.headers = CaseInsensitiveDict(fixture['headers'])
+        body = fixture['response']
+        response._content = (body if isinstance(body, str) else json.dumps(body)).encode() if body is not None else b''
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
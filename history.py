@@ -0,0 +1,141 @@
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import constants
+
+
+class HistoryStore:
+    """
+    Local SQLite history of the applications of every account and their allotment results, keyed by account and
+    `applicantFormId`. Synced incrementally and queried offline.
+    """
+
+    def __init__(self, path=constants.HISTORY_DB_PATH, create=True):
+        """
+        :param create: create the store when it doesn't exist yet, otherwise a missing store is an error
+        """
+        if not create and not os.path.exists(path):
+            raise FileNotFoundError(f"History database not found: {path}, sync it first with --sync-history")
+        # each account syncs with its own store, concurrent writers wait on SQLite's file lock
+        self.connection = sqlite3.connect(path, timeout=30)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS applications ("
+                "account TEXT NOT NULL, applicant_form_id INTEGER NOT NULL, company_name TEXT, scrip TEXT, "
+                "share_type TEXT, share_group TEXT, status_name TEXT, applied_date TEXT, allotment_status TEXT, "
+                "updated_at REAL NOT NULL, PRIMARY KEY (account, applicant_form_id))"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS applications_scrip ON applications (scrip)")
+
+    def last_applied_date(self, account):
+        """
+        :return: date of the latest synced application of the account, None before the first sync
+        """
+        row = self.connection.execute("SELECT MAX(applied_date) FROM applications WHERE account = ?",
+                                      (account,)).fetchone()
+        return date.fromisoformat(row[0]) if row[0] else None
+
+    def oldest_unapproved_date(self, account, since):
+        """
+        :return: date of the oldest application of the account made on or after `since` that isn't approved and has no
+                 final allotment status, None when there is none
+        """
+        statuses = constants.APPROVED_APPLICATION_STATUSES
+        finals = constants.FINAL_ALLOTMENT_STATUSES
+        row = self.connection.execute(
+            f"SELECT MIN(applied_date) FROM applications WHERE account = ? AND applied_date >= ? "
+            f"AND (status_name IS NULL OR status_name NOT IN ({', '.join('?' * len(statuses))})) "
+            f"AND (allotment_status IS NULL OR allotment_status NOT IN ({', '.join('?' * len(finals))}))",
+            (account, since.isoformat(), *statuses, *finals)
+        ).fetchone()
+        return date.fromisoformat(row[0]) if row[0] else None
+
+    def save_applications(self, account, applications):
+        """
+        Inserts or updates the `Application`s as returned by `UserSession.iter_applications`, keeping the allotment
+        status already stored.
+
+        :return: number of applications saved
+        """
+        rows = [
+            (account, application.applicant_form_id, application.company_name, application.scrip,
+             application.share_type.value, application.share_group.value, application.status_name,
+             application.applied_date, time.time())
+            for application in applications
+        ]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO applications (account, applicant_form_id, company_name, scrip, share_type, share_group, "
+                "status_name, applied_date, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (account, applicant_form_id) DO UPDATE SET status_name = excluded.status_name, "
+                "updated_at = excluded.updated_at",
+                rows
+            )
+        return len(rows)
+
+    def pending_applications(self, account):
+        """
+        :return: ids of the approved applications of the account without a final allotment status
+        """
+        statuses = constants.APPROVED_APPLICATION_STATUSES
+        finals = constants.FINAL_ALLOTMENT_STATUSES
+        rows = self.connection.execute(
+            f"SELECT applicant_form_id FROM applications WHERE account = ? "
+            f"AND status_name IN ({', '.join('?' * len(statuses))}) "
+            f"AND (allotment_status IS NULL OR allotment_status NOT IN ({', '.join('?' * len(finals))}))",
+            (account, *statuses, *finals)
+        )
+        return [row[0] for row in rows]
+
+    def save_allotment_statuses(self, account, statuses):
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE applications SET allotment_status = ?, updated_at = ? "
+                "WHERE account = ? AND applicant_form_id = ?",
+                [(status, time.time(), account, application_id) for application_id, status in statuses.items()]
+            )
+
+    def sync(self, user, since_days=365, recheck_days=30):
+        """
+        Fetches the applications of the user made since the last synced application, or in the last `since_days`
+        days on the first sync, then the allotment status of the applications still pending. Applications made in
+        the last `recheck_days` days that weren't approved yet when synced are fetched again, so they get their
+        allotment status once approved.
+
+        :return: tuple of (applications saved, allotment statuses updated)
+        """
+        account = user.account.user
+        today = date.today()
+        start_date = self.last_applied_date(account) or today - timedelta(days=since_days)
+        unapproved_date = self.oldest_unapproved_date(account, today - timedelta(days=recheck_days))
+        if unapproved_date and unapproved_date < start_date:
+            start_date = unapproved_date
+        saved = self.save_applications(account, user.iter_applications(start_date, today))
+
+        pending = self.pending_applications(account)
+        with ThreadPoolExecutor(max_workers=user.detail_workers) as executor:
+            statuses = dict(zip(pending, executor.map(user.allotment_status, pending)))
+        self.save_allotment_statuses(account, statuses)
+
+        return saved, len(statuses)
+
+    def allotment_rates(self, group_by='account', account=None):
+        """
+        :param group_by: 'account' or 'scrip'
+        :return: list of (group, applications with a result, alloted, allotment rate) rows
+        """
+        column = {'account': 'account', 'scrip': 'scrip'}[group_by]
+        finals = constants.FINAL_ALLOTMENT_STATUSES
+        rows = self.connection.execute(
+            f"SELECT {column}, COUNT(*), SUM(allotment_status = ?) FROM applications "
+            f"WHERE allotment_status IN ({', '.join('?' * len(finals))}) AND (? IS NULL OR account = ?) "
+            f"GROUP BY {column} ORDER BY {column}",
+            ('Alloted', *finals, account, account)
+        )
+        return [(group, total, alloted, alloted / total) for group, total, alloted in rows]
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,94 @@
+import os
+import re
+from datetime import datetime
+
+import constants
+
+try:
+    import fcntl
+except ImportError:
+    # file locks are only supported on Linux and other Unix systems, accounts aren't locked elsewhere
+    fcntl = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+UNSAFE_FILENAME_CHARACTERS = re.compile(r'[^\w.-]')
+# open files left for connections, caches and imports when a run holds many locks at once
+OPEN_FILE_RESERVE = 256
+
+
+def raise_open_file_limit():
+    """
+    Raises the soft limit of open files of the process to its hard limit, for runs holding the lock of every account
+    at once. The default soft limit of 1024 is reached by about a thousand lock files and the pooled connections.
+
+    :return: the soft limit of open files, None when it's unknown or unlimited
+    """
+    if resource is None:
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+            soft = hard
+        except (ValueError, OSError):
+            pass
+    return None if soft == resource.RLIM_INFINITY else soft
+
+
+class AccountLock:
+    """
+    Exclusive lock file per account, held while applying for the account, so runs overlapping in time (cron jitter,
+    the same shard started twice) never apply for the same account at once. The lock is an `flock` released by the
+    kernel when the process exits or dies, a lock file left behind never blocks a later run.
+    """
+
+    def __init__(self, user, directory=constants.LOCK_DIRECTORY):
+        self.path = os.path.join(directory, UNSAFE_FILENAME_CHARACTERS.sub('_', user) + '.lock')
+        self.directory = directory
+        self.file = None
+
+    def acquire(self):
+        """
+        :return: True when the lock was acquired, False when another run holds it
+        """
+        if fcntl is None:
+            return True
+
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        file = open(self.path, 'a+')
+        try:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            file.close()
+            return False
+
+        file.truncate(0)
+        file.write(f"pid {os.getpid()} since {datetime.now().isoformat(timespec='seconds')}\n")
+        file.flush()
+        self.file = file
+        return True
+
+    def holder(self):
+        """
+        :return: the process holding the lock as written in the lock file, e.g. "pid 123 since 2024-04-25T10:00:00"
+        """
+        try:
+            with open(self.path) as file:
+                return file.read().strip() or 'unknown'
+        except OSError:
+            return 'unknown'
+
+    def release(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
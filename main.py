@@ -1,26 +1,121 @@
 import csv
 import os
+import sys
+import threading
+import zlib
 import argparse
-import requests
 import constants
-from datetime import date
-from functools import cache, cached_property
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+from dataclasses import asdict, dataclass, fields
+from enum import Enum
+from functools import cache
+from typing import ClassVar
+from account_store import ACCOUNT_FIELDS, AccountStore, is_account_store
+from cache import AllotmentCache, SessionCache
+from history import HistoryStore
+from locks import OPEN_FILE_RESERVE, AccountLock, raise_open_file_limit
+from output import FORMATS, create_writer, merge_results, print_header
+from profiling import RequestProfiler
+from ratelimit import AdaptiveRateLimiter, CircuitBreaker
+from scheduler import ScheduledApply, parse_at
 
 
-def find_accounts_from_csv(user=None):
-    acs = []
-    with open(constants.ACCOUNTS_CSV_PATH, newline='') as file:
-        csv_reader = csv.DictReader(file)
-        if user:
-            row = next((item for item in csv_reader if item['user'] == user), None)
+APPLIED = "APPLIED SUCCESSFULLY"
+ALREADY_APPLIED = "ALREADY APPLIED"
+CANNOT_APPLY = "CANNOT APPLY"
+APPLY_UNSUCCESSFUL = "APPLY UNSUCCESSFUL"
+ISSUE_NOT_FOUND = "UNAPPLIED ISSUE NOT FOUND"
+DRY_RUN = "DRY RUN, NOT APPLIED"
+SKIPPED = "SKIPPED, ACCOUNT LOCKED"
+
+
+class IssueNotFoundError(ValueError):
+    pass
+
+
+def find_accounts_from_csv(user=None, path=constants.ACCOUNTS_CSV_PATH, shard=None):
+    """
+    :param shard: tuple of (K, N), only return the accounts of the Kth of N shards
+    """
+    if user:
+        accounts = iter_accounts(path, user)
+        account = next(accounts, None)
+        accounts.close()
+        if account:
+            return [account]
+
+        raise argparse.ArgumentError(name_arg, f"'{user}' user not found in {path} file")
+
+    return [account for account in iter_accounts(path) if shard is None or in_shard(account.user, shard)]
+
+
+def parse_shard(value):
+    """
+    :param value: "K/N", the Kth of N shards, K from 1 to N
+    :return: tuple of (K, N)
+    """
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' isn't in the K/N format") from None
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"'{value}': K must be between 1 and N")
+    return index, count
+
+
+def in_shard(user, shard):
+    """
+    Accounts are spread over the shards by a hash of their user, the same on every process and machine and
+    independent of the order of the accounts file.
+    """
+    index, count = shard
+    return zlib.crc32(user.encode()) % count == index - 1
+
+
+def iter_accounts(path=constants.ACCOUNTS_CSV_PATH, user=None):
+    """
+    Streams the validated accounts of a CSV file or an account store.
+
+    :param user: only yield the account of this user
+    """
+    if not is_account_store(path):
+        yield from iter_accounts_from_csv(path, user)
+        return
+
+    store = AccountStore(path)
+    try:
+        rows = [store.find(user)] if user else store
+        for row in rows:
             if row:
-                return [Account(row['user'], row['dp'], row['username'], row['password'], row['crn'], row['pin'])]
+                yield Account.from_row(row)
+    finally:
+        store.close()
 
-            raise argparse.ArgumentError(name_arg, f"'{user}' user not found in accounts.csv file")
-        else:
-            acs.extend([Account(row['user'], row['dp'], row['username'], row['password'], row['crn'], row['pin']) for row in csv_reader])
 
-    return acs
+def iter_accounts_from_csv(path=constants.ACCOUNTS_CSV_PATH, user=None):
+    with open(path, newline='') as file:
+        csv_reader = csv.DictReader(file)
+        missing = [field for field in ACCOUNT_FIELDS if field not in (csv_reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"{path}: missing column(s): {', '.join(missing)}")
+
+        for row in csv_reader:
+            if user and row['user'] != user:
+                continue
+            try:
+                yield Account.from_row(row)
+            except ValueError as e:
+                raise ValueError(f"{path}, line {csv_reader.line_num}: {e}") from None
+
+
+@cache
+def client_ids_by_dp():
+    """
+    :return: dict of DP code -> client id, indexed from `constants.CAPITALS` on first use
+    """
+    return {capital['code']: capital['id'] for capital in constants.CAPITALS}
 
 
 class Account:
@@ -33,19 +128,111 @@ class Account:
         self.crn = crn
         self.pin = pin
 
+    @classmethod
+    def from_row(cls, row):
+        empty = [field for field in ACCOUNT_FIELDS if not (row.get(field) or '').strip()]
+        if empty:
+            raise ValueError(f"'{row.get('user')}' has empty {', '.join(empty)}")
+
+        return cls(row['user'], row['dp'], row['username'], row['password'], row['crn'], row['pin'])
+
     @staticmethod
     def get_client_id(dp):
         """
         :param dp: depository participant id
         :return: integer, client id in meroshare system
         """
-        capital = next(item for item in constants.CAPITALS if item['code'] == str(dp))
-        return capital['id']
+        client_id = client_ids_by_dp().get(str(dp))
+        if client_id is None:
+            raise ValueError(f"unknown DP '{dp}', it isn't listed in constants.CAPITALS")
+        return client_id
+
+
+class LenientEnum(Enum):
+    """
+    Enum keeping the values it doesn't know about as extra members instead of failing, MeroShare may add new ones
+    any time.
+    """
+
+    @classmethod
+    def parse(cls, value):
+        # a plain dict lookup, skips the slower `EnumType.__call__` for known values
+        member = cls._value2member_map_.get(value)
+        return member if member is not None else cls(value)
 
+    @classmethod
+    def _missing_(cls, value):
+        with _unknown_members_lock:
+            member = _unknown_members.get((cls, value))
+            if member is None:
+                member = object.__new__(cls)
+                member._name_ = str(value).upper().replace(' ', '_')
+                member._value_ = value
+                _unknown_members[(cls, value)] = member
+            return member
 
+
+_unknown_members = {}
+_unknown_members_lock = threading.Lock()
+
+
+class ShareType(LenientEnum):
+    IPO = "IPO"
+    FPO = "FPO"
+
+
+class ShareGroup(LenientEnum):
+    ORDINARY_SHARES = "Ordinary Shares"
+
+
+class IssueAction(LenientEnum):
+    NONE = None
+    EDIT = "edit"
+
+
+@dataclass(slots=True)
 class Issue:
-    def __init__(self, json_data):
-        self._json_data = json_data
+    company_share_id: int
+    company_name: str
+    scrip: str
+    subgroup: str
+    share_type: ShareType
+    share_group: ShareGroup
+    status_name: str
+    issue_open_date: str
+    issue_close_date: str
+    action: IssueAction = IssueAction.NONE
+
+    RECORD_FIELDS: ClassVar[tuple] = ('company_share_id', 'scrip', 'company_name', 'share_type', 'share_group',
+                                      'subgroup', 'issue_open_date', 'issue_close_date', 'status')
+
+    @classmethod
+    def from_json(cls, json_data, action=None):
+        """
+        Picks the fields used by the script out of an `applicableIssue` object.
+
+        :param action: the account's action flag, defaults to the one in `json_data`
+        """
+        return cls(
+            company_share_id=json_data.get("companyShareId"),
+            company_name=json_data.get("companyName"),
+            scrip=json_data.get("scrip"),
+            subgroup=json_data.get("subGroup"),
+            share_type=ShareType.parse(json_data.get("shareTypeName")),
+            share_group=ShareGroup.parse(json_data.get("shareGroupName")),
+            status_name=json_data.get("statusName"),
+            issue_open_date=json_data.get("issueOpenDate"),
+            issue_close_date=json_data.get("issueCloseDate"),
+            action=IssueAction.parse(action if action is not None else json_data.get("action")),
+        )
+
+    def with_action(self, action):
+        """
+        :return: a copy of the issue with the given account's action flag, the issue itself is shared by all accounts
+        """
+        return Issue(self.company_share_id, self.company_name, self.scrip, self.subgroup, self.share_type,
+                     self.share_group, self.status_name, self.issue_open_date, self.issue_close_date,
+                     IssueAction.parse(action))
 
     def __str__(self):
         return (
@@ -64,21 +251,34 @@ class Issue:
                 status=self.status.capitalize())
         )
 
+    def to_record(self):
+        return {
+            'company_share_id': self.company_share_id,
+            'scrip': self.scrip,
+            'company_name': self.company_name,
+            'share_type': self.share_type_name,
+            'share_group': self.share_group_name,
+            'subgroup': self.subgroup,
+            'issue_open_date': self.issue_open_date,
+            'issue_close_date': self.issue_close_date,
+            'status': self.status
+        }
+
     @property
     def is_unapplied_ordinary_share(self):
         return self.is_ordinary_shares and not self.is_applied
 
     @property
     def is_ipo(self):
-        return True if self.share_type_name == 'IPO' else False
+        return self.share_type is ShareType.IPO
 
     @property
     def is_fpo(self):
-        return True if self.share_type_name == 'FPO' else False
+        return self.share_type is ShareType.FPO
 
     @property
     def is_ordinary_shares(self):
-        return True if self.share_group_name == 'Ordinary Shares' else False
+        return self.share_group is ShareGroup.ORDINARY_SHARES
 
     @property
     def status(self):
@@ -86,69 +286,204 @@ class Issue:
 
     @property
     def is_applied(self):
-        return True if self.action == "edit" else False
+        return self.action is IssueAction.EDIT
 
-    @cached_property
-    def company_share_id(self):
-        return self._json_data.get("companyShareId")
+    @property
+    def share_type_name(self):
+        return self.share_type.value
 
-    @cached_property
-    def subgroup(self):
-        return self._json_data.get("subGroup")
+    @property
+    def share_group_name(self):
+        return self.share_group.value
 
-    @cached_property
-    def scrip(self):
-        return self._json_data.get("scrip")
 
-    @cached_property
-    def company_name(self):
-        return self._json_data.get("companyName")
+@dataclass(slots=True)
+class Application:
+    applicant_form_id: int
+    company_name: str
+    scrip: str
+    share_type: ShareType
+    share_group: ShareGroup
+    status_name: str
+    applied_date: str
+    allotment_status: str = None
 
-    @cached_property
-    def share_type_name(self):
-        return self._json_data.get("shareTypeName")
+    RECORD_FIELDS: ClassVar[tuple] = ('applicant_form_id', 'scrip', 'company_name', 'share_type', 'share_group',
+                                      'status_name', 'applied_date', 'allotment_status')
 
-    @cached_property
-    def share_group_name(self):
-        return self._json_data.get("shareGroupName")
+    @classmethod
+    def from_json(cls, json_data):
+        """
+        Picks the fields used by the script out of an `applicantForm/active/search` object.
+        """
+        return cls(
+            applicant_form_id=json_data["applicantFormId"],
+            company_name=json_data.get("companyName"),
+            scrip=json_data.get("scrip"),
+            share_type=ShareType.parse(json_data.get("shareTypeName")),
+            share_group=ShareGroup.parse(json_data.get("shareGroupName")),
+            status_name=json_data.get("statusName"),
+            applied_date=(json_data.get("appliedDate") or "")[:10] or None,
+        )
 
-    @cached_property
-    def status_name(self):
-        return self._json_data.get("statusName")
+    def __str__(self):
+        return f"{self.company_name} - {self.allotment_status}"
 
-    @cached_property
-    def action(self):
-        return self._json_data.get("action")
+    def to_record(self):
+        return {
+            'applicant_form_id': self.applicant_form_id,
+            'scrip': self.scrip,
+            'company_name': self.company_name,
+            'share_type': self.share_type.value,
+            'share_group': self.share_group.value,
+            'status_name': self.status_name,
+            'applied_date': self.applied_date,
+            'allotment_status': self.allotment_status
+        }
+
+    @property
+    def is_approved(self):
+        return self.status_name in constants.APPROVED_APPLICATION_STATUSES
 
-    @cached_property
-    def issue_open_date(self):
-        return self._json_data.get("issueOpenDate")
 
-    @cached_property
-    def issue_close_date(self):
-        return self._json_data.get("issueCloseDate")
+@dataclass(slots=True)
+class ApplyResult:
+    company_share_id: int
+    status: str
+
+    RECORD_FIELDS: ClassVar[tuple] = ('company_share_id', 'status')
+
+    def __str__(self):
+        return f"{self.status}!! -- {self.company_share_id}"
+
+    def to_record(self):
+        return asdict(self)
+
+
+@dataclass(slots=True)
+class SyncResult:
+    applications_synced: int
+    allotments_checked: int
+
+    RECORD_FIELDS: ClassVar[tuple] = ('applications_synced', 'allotments_checked')
+
+    def __str__(self):
+        return f"{self.applications_synced} applications synced, {self.allotments_checked} allotment statuses checked"
+
+    def to_record(self):
+        return asdict(self)
+
+
+class IssueCatalog:
+    """
+    Run-wide index of the open issues by company share id. The issue details are the same for every account, so they
+    are stored once, each account only keeps its own applied/not applied `action` flags.
+    """
+
+    def __init__(self):
+        self._issues = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, company_share_id):
+        return company_share_id in self._issues
+
+    def __len__(self):
+        return len(self._issues)
+
+    def add(self, json_data):
+        """
+        Adds the issue or replaces it with the latest details fetched, e.g. an extended close date.
+        """
+        issue = Issue.from_json(json_data).with_action(None)
+        with self._lock:
+            self._issues[issue.company_share_id] = issue
+
+    def issue(self, company_share_id, action=None):
+        issue = self._issues.get(company_share_id)
+        return issue.with_action(action) if issue else None
+
+
+# result fields written as numbers, read back as such from CSV result files
+INTEGER_RECORD_FIELDS = frozenset(field.name for result in (Issue, Application, ApplyResult, SyncResult)
+                                  for field in fields(result) if field.type is int)
 
 
 class UserSession:
-    def __init__(self, account):
+    def __init__(self, account, transport=None, session_cache=None, allotment_cache=None, detail_workers=4,
+                 page_size=20, catalog=None, dry_run=False):
+        """
+        :param dry_run: build and validate the apply requests without sending them
+        """
         self.account = account
+        self.catalog = catalog if catalog is not None else IssueCatalog()
+        self.issue_actions = None
+        self.page_size = page_size
+        if transport is None:
+            from transport import Transport
+            transport = Transport()
+        self.transport = transport
+        self.session_cache = session_cache
+        self.allotment_cache = allotment_cache
+        self.detail_workers = detail_workers
+        self.dry_run = dry_run
         self.authorization = None
         self.branch_info = None
+        self.from_cache = False
+        self.refreshing = False
         self.set_user_session_defaults()
 
     def set_user_session_defaults(self):
+        if self.session_cache:
+            cached = self.session_cache.get(self.account)
+            if cached:
+                self.authorization = cached['authorization']
+                self.branch_info = cached['branch_info']
+                self.from_cache = True
+                return
+
         self.create_session()
         self.set_branch_info()
+        if self.session_cache:
+            self.session_cache.set(self.account, self.authorization, self.branch_info)
+
+    def refresh_session(self):
+        self.refreshing = True
+        try:
+            if self.session_cache:
+                self.session_cache.invalidate(self.account)
+            self.from_cache = False
+            self.set_user_session_defaults()
+        finally:
+            self.refreshing = False
+
+    def request(self, method, path, **kwargs):
+        """
+        Sends an authorized request, a session rejected by the backend, cached or expired in a long run, is replaced
+        with a new one and the request is sent again.
+        """
+        r = self.transport.request(method, path, headers=self.authorization_headers, account=self.account.user,
+                                   **kwargs)
+        if r.status_code == 401 and not self.refreshing:
+            self.refresh_session()
+            r = self.transport.request(method, path, headers=self.authorization_headers, account=self.account.user,
+                                       **kwargs)
+        return r
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
 
     def create_session(self):
-        r = requests.post(
-            'https://webbackend.cdsc.com.np/api/meroShare/auth/',
+        r = self.transport.post(
+            'auth/',
             json={
                 'clientId': self.account.client_id,
                 'username': self.account.username,
                 'password': self.account.password
             },
-            verify=False
+            account=self.account.user
         )
 
         if r.ok:
@@ -159,8 +494,7 @@ class UserSession:
     def set_branch_info(self):
         bank = self.bank_info()
         # [{"code":"123","id":123,"name":"Nepal Mega Bank Ltd."}]
-        r = requests.get(f"https://webbackend.cdsc.com.np/api/meroShare/bank/{bank['id']}",
-                         headers=self.authorization_headers, verify=False)
+        r = self.get(f"bank/{bank['id']}")
         if r.ok:
             # [
             #     {
@@ -179,9 +513,7 @@ class UserSession:
             raise ValueError("Unable to fetch banks for user: '%s'" % self.account.user)
 
     def bank_info(self):
-        r = requests.get('https://webbackend.cdsc.com.np/api/meroShare/bank/',
-                         headers=self.authorization_headers,
-                         verify=False)
+        r = self.get('bank/')
         if r.ok:
             banks = r.json()
             if len(banks) == 0:
@@ -202,27 +534,72 @@ class UserSession:
         }
 
     def can_apply(self, company_share_id):
-        response = requests.get(
-            f"https://webbackend.cdsc.com.np/api/meroShare/applicantForm/customerType/{company_share_id}/{self.demat}",
-            headers=self.authorization_headers, verify=False).json()
+        response = self.get(f"applicantForm/customerType/{company_share_id}/{self.demat}").json()
 
         return True if response['message'] == "Customer can apply." else False
 
+    def find_issue(self, company_share_id):
+        """
+        Looks the issue up in the run-wide catalog with this account's own applied/not applied flag, the account's open
+        issues are fetched once to resolve its flags. Issues that aren't open for this account aren't found, even when
+        another account added them to the catalog.
+        """
+        if self.issue_actions is None:
+            self.open_issues()
+
+        if company_share_id not in self.issue_actions:
+            return None
+        return self.catalog.issue(company_share_id, action=self.issue_actions[company_share_id])
+
     def apply(self, number_of_shares, company_share_id):
-        issues = self.open_issues()
-        issue = next(
-            (item for item in issues if item.is_unapplied_ordinary_share and item.company_share_id == company_share_id),
-            None
-        )
+        """
+        :return: one of APPLIED, ALREADY_APPLIED, CANNOT_APPLY, APPLY_UNSUCCESSFUL or DRY_RUN
+        """
+        issue = self.find_issue(company_share_id)
+
+        if not issue or not issue.is_ordinary_shares:
+            raise IssueNotFoundError(f"{ISSUE_NOT_FOUND}!! -- {company_share_id}")
 
-        if not issue:
-            raise ValueError(f"UNAPPLIED ISSUE NOT FOUND!! -- {company_share_id}")
+        if issue.is_applied:
+            return ALREADY_APPLIED
 
         if not self.can_apply(company_share_id):
-            print(f"CANNOT APPLY!! -- {company_share_id}")
-            return
+            return CANNOT_APPLY
 
-        payload = {
+        payload = self.apply_payload(number_of_shares, company_share_id)
+        if self.dry_run:
+            validate_apply_payload(payload)
+            return DRY_RUN
+
+        r = self.submit_apply(payload)
+
+        return APPLIED if r.ok else APPLY_UNSUCCESSFUL
+
+    def apply_many(self, number_of_shares, company_share_ids):
+        """
+        Applies to several issues in a single pass, the checks and applications of the issues run concurrently.
+
+        :return: dict of company share id -> apply status, ISSUE_NOT_FOUND for the issues that can't be applied to
+        """
+        # an issue given twice would be applied to twice at the same time
+        company_share_ids = list(dict.fromkeys(company_share_ids))
+        # fetch the account's issues once upfront instead of letting the concurrent applies race for them
+        self.open_issues()
+
+        def _apply(company_share_id):
+            try:
+                return self.apply(number_of_shares, company_share_id)
+            except IssueNotFoundError:
+                return ISSUE_NOT_FOUND
+
+        with ThreadPoolExecutor(max_workers=max(len(company_share_ids), 1)) as executor:
+            return dict(zip(company_share_ids, executor.map(_apply, company_share_ids)))
+
+    def unapplied_issue_ids(self):
+        return [issue.company_share_id for issue in self.open_issues() if issue.is_unapplied_ordinary_share]
+
+    def apply_payload(self, number_of_shares, company_share_id):
+        return {
             "demat": self.demat,
             "boid": self.account.username,
             "accountNumber": self.branch_info['accountNumber'],
@@ -236,18 +613,23 @@ class UserSession:
             "bankId": self.branch_info['bankId']
         }
 
-        r = requests.post('https://webbackend.cdsc.com.np/api/meroShare/applicantForm/share/apply',
-                          json=payload,
-                          headers=self.authorization_headers,
-                          verify=False)
+    def submit_apply(self, payload, limit=True):
+        """
+        :param limit: set to False to send the application without waiting for the transport's rate limiter
+        """
+        return self.post('applicantForm/share/apply', json=payload, retry=False, limit=limit)
 
-        if r.ok:
-            print(f"APPLIED SUCCESSFULLY!! -- {company_share_id}")
-        else:
-            print(f"APPLY UNSUCCESSFUL!! -- {company_share_id}")
+    def is_applied(self, company_share_id):
+        """
+        Checks the account's current open issues, bypassing the cached `open_issues`.
+        """
+        return any(issue.is_applied for issue in self.iter_open_issues() if issue.company_share_id == company_share_id)
 
     @cache
     def open_issues(self):
+        return list(self.iter_open_issues())
+
+    def iter_open_issues(self):
         payload = {
             "filterFieldParams": [
                 {
@@ -278,22 +660,39 @@ class UserSession:
                     "value": ""
                 }
             ],
-            "page": 1,
-            "size": 20,
             "searchRoleViewConstants": "VIEW_APPLICABLE_SHARE"
         }
 
-        r = requests.post('https://webbackend.cdsc.com.np/api/meroShare/companyShare/applicableIssue/',
-                          json=payload, headers=self.authorization_headers, verify=False)
-        if r.ok:
-            objects = r.json()['object']
-            return [Issue(_item) for _item in objects]
-        else:
-            raise ValueError("Error while getting open issues!!")
+        self.issue_actions = {}
+        for _item in self.paginate('companyShare/applicableIssue/', payload, "Error while getting open issues!!"):
+            company_share_id = _item.get("companyShareId")
+            self.catalog.add(_item)
+            self.issue_actions[company_share_id] = _item.get("action")
+            yield self.catalog.issue(company_share_id, action=_item.get("action"))
+
+    def generate_reports(self, start_date=None, end_date=None):
+        """
+        Iterates over the applications made between `start_date` and `end_date` with their allotment status, defaults
+        to the last 60 days.
+        """
+        end_date = end_date or date.today()
+        start_date = start_date or end_date - timedelta(days=60)
+        objects = self.iter_applications(start_date, end_date)
+        statuses = {}
+        try:
+            with ThreadPoolExecutor(max_workers=self.detail_workers) as executor:
+                for application in bounded_map(executor, self.with_allotment_status, objects,
+                                               self.detail_workers * 2):
+                    statuses[application.applicant_form_id] = application.allotment_status
+                    yield application
+        finally:
+            if self.allotment_cache:
+                self.allotment_cache.update(statuses)
 
-    def generate_reports(self):
-        today = date.today()
-        two_months_ago = today.replace(month=today.month - 2)
+    def iter_applications(self, start_date, end_date):
+        """
+        Iterates over the `Application`s made between `start_date` and `end_date`, without their allotment status.
+        """
         payload = {
             "filterFieldParams": [
                 {
@@ -305,43 +704,346 @@ class UserSession:
                     "alias": "Company Name"
                 }
             ],
-            "page": 1,
-            "size": 20,
             "searchRoleViewConstants": "VIEW_APPLICANT_FORM_COMPLETE",
             "filterDateParams": [
                 {
                     "key": "appliedDate",
                     "condition": "",
                     "alias": "",
-                    "value": f"BETWEEN '{two_months_ago}' AND '{today}'"
+                    "value": f"BETWEEN '{start_date}' AND '{end_date}'"
                 }
             ]
         }
 
-        r = requests.post('https://webbackend.cdsc.com.np/api/meroShare/applicantForm/active/search/',
-                          json=payload, headers=self.authorization_headers)
+        objects = self.paginate('applicantForm/active/search/', payload, "Error while fetching application reports!!")
+        return (Application.from_json(_item) for _item in objects)
+
+    def paginate(self, path, payload, error_message):
+        """
+        Iterates over the objects of every page of a search endpoint, the next page is fetched while the current one
+        is being consumed.
+        """
+        def fetch(page):
+            r = self.post(path, json={**payload, "page": page, "size": self.page_size})
+            if not r.ok:
+                raise ValueError(error_message)
+            data = r.json()
+            return data['object'], data.get('totalCount')
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            page = 1
+            future = executor.submit(fetch, page)
+            while future:
+                objects, total_count = future.result()
+                has_next_page = len(objects) == self.page_size and (
+                        total_count is None or page * self.page_size < total_count)
+                page += 1
+                future = executor.submit(fetch, page) if has_next_page else None
+                yield from objects
+
+    def with_allotment_status(self, application):
+        if application.is_approved:
+            application.allotment_status = self.allotment_status(application.applicant_form_id)
+        else:
+            application.allotment_status = 'N/A'
+
+        return application
+
+    def allotment_status(self, application_id):
+        if self.allotment_cache:
+            allotment_status = self.allotment_cache.get(application_id)
+            if allotment_status:
+                return allotment_status
+
+        r = self.get(f"applicantForm/report/detail/{application_id}")
         if r.ok:
-            objects = r.json()['object']
-            return [self.with_allotment_status(_item) for _item in objects]
+            return r.json()['statusName']
         else:
-            raise ValueError("Error while fetching application reports!!")
-
-    def with_allotment_status(self, _item):
-        application_id = _item['applicantFormId']
-        if _item['statusName'] in ['TRANSACTION_SUCCESS', 'APPROVED']:
-            r = requests.get(
-                f"https://webbackend.cdsc.com.np/api/meroShare/applicantForm/report/detail/{application_id}",
-                headers=self.authorization_headers,
-                verify=False)
-            if r.ok:
-                allotment_status = r.json()['statusName']
-                _item['allotmentStatus'] = allotment_status
+            raise ValueError("Error while fetching application allotment status!!")
+
+
+def validate_apply_payload(payload):
+    """
+    Checks an apply payload the way the backend would before an application is sent.
+
+    :raise ValueError: listing every invalid field
+    """
+    digits = {
+        'demat': 16,
+        'boid': 8,
+        'transactionPIN': 4
+    }
+    errors = [f"{key} is missing" for key, value in payload.items() if value in (None, '')]
+    errors += [f"{key} must be {length} digits" for key, length in digits.items()
+               if payload.get(key) and not (str(payload[key]).isdigit() and len(str(payload[key])) == length)]
+    for key in ('appliedKitta', 'companyShareId'):
+        if payload.get(key) and not (str(payload[key]).isdigit() and int(payload[key]) > 0):
+            errors.append(f"{key} must be a positive number")
+    if errors:
+        raise ValueError(f"Invalid apply request: {', '.join(errors)}")
+
+
+def bounded_map(executor, fn, iterable, window):
+    """
+    Like `executor.map` but keeps at most `window` calls in flight instead of consuming the whole iterable upfront.
+    Results are yielded in order.
+    """
+    futures = deque()
+    try:
+        for item in iterable:
+            futures.append(executor.submit(fn, item))
+            if len(futures) >= window:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def run_account(account, args, session_options, apply_results=None):
+    """
+    Runs the selected action for a single account.
+
+    :param session_options: keyword arguments shared by the `UserSession` of every account in the run
+    :param apply_results: dict the apply statuses of the account are added to, by user
+    :return: generator of the account's results, `Issue`, `Application`, `ApplyResult` or `SyncResult` depending on the
+             action, and plain string notes
+    """
+    user = UserSession(account=account, **session_options)
+
+    if args.sync_history:
+        store = HistoryStore(args.history_db)
+        try:
+            saved, updated = store.sync(user)
+        finally:
+            store.close()
+        yield SyncResult(saved, updated)
+    elif args.report:
+        yield from user.generate_reports(args.start_date, args.end_date)
+    elif args.apply:
+        with AccountLock(account.user, args.lock_dir) as lock:
+            locked = lock.acquire()
+            company_share_ids = user.unapplied_issue_ids() if args.all_unapplied else args.company_share_id
+            if locked:
+                statuses = user.apply_many(args.number_of_shares, company_share_ids)
             else:
-                raise ValueError("Error while fetching application allotment status!!")
+                yield f"SKIPPED!! -- another run is applying for this account, {lock.holder()}"
+                statuses = dict.fromkeys(company_share_ids, SKIPPED)
+            if apply_results is not None:
+                apply_results[account.user] = statuses
+            if not statuses:
+                yield "NO UNAPPLIED ISSUES!!"
+            for company_share_id, status in statuses.items():
+                yield ApplyResult(company_share_id, status)
+    else:
+        yield from user.iter_open_issues()
+
+
+def result_fields(args):
+    """
+    :return: fields of the results `run_account` yields for the selected action
+    """
+    if args.sync_history:
+        return SyncResult.RECORD_FIELDS
+    if args.report:
+        return Application.RECORD_FIELDS
+    if args.apply:
+        return ApplyResult.RECORD_FIELDS
+    return Issue.RECORD_FIELDS
+
+
+def buffered_run_account(*args):
+    return list(run_account(*args))
+
+
+def future_results(future):
+    yield from future.result()
+
+
+def write_account(writer, account, results, failures):
+    writer.start_account(account)
+    try:
+        for result in results:
+            writer.write(account, result)
+    except Exception as e:
+        failures[account.user] = e
+        writer.failed(account, e)
+
+
+def run_accounts(accounts, args, session_options, writer, apply_results=None):
+    """
+    Runs the selected action for all accounts with at most `args.workers` accounts in flight. The results are written
+    grouped by account as each one finishes and dropped once written, with a single worker they are streamed as
+    they're fetched.
+
+    :return: dict of user -> exception for the accounts that failed
+    """
+    failures = {}
+    if args.workers == 1:
+        for account in accounts:
+            write_account(writer, account, run_account(account, args, session_options, apply_results), failures)
+        return failures
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(buffered_run_account, account, args, session_options, apply_results): account
+                   for account in accounts}
+        for future in as_completed(futures):
+            write_account(writer, futures.pop(future), future_results(future), failures)
+
+    return failures
+
+
+def run_scheduled_apply(accounts, args, session_options, apply_results=None):
+    """
+    Logs in every account `args.warmup` seconds before `args.at` and applies for all of them at `args.at`. Accounts
+    another run is applying for are skipped.
+
+    :param apply_results: dict the apply statuses of the accounts are added to, by user
+    :return: dict of user -> exception for the accounts that failed
+    """
+    # every account's lock file stays open until the apply is fired
+    open_file_limit = raise_open_file_limit()
+    max_locks = open_file_limit - OPEN_FILE_RESERVE if open_file_limit else None
+    locks, skipped, failures = {}, {}, {}
+    for account in accounts:
+        if max_locks is not None and len(locks) >= max_locks:
+            failures[account.user] = ValueError(f"Too many accounts to lock at once, the open file limit is "
+                                                f"{open_file_limit}, raise it with `ulimit -n`")
+            continue
+        lock = AccountLock(account.user, args.lock_dir)
+        try:
+            if lock.acquire():
+                locks[account.user] = lock
+            else:
+                skipped[account.user] = lock.holder()
+        except OSError as e:
+            failures[account.user] = e
+
+    scheduled = ScheduledApply(lambda account: UserSession(account=account, **session_options),
+                               args.company_share_id[0], args.number_of_shares, workers=args.workers, rate=args.rate,
+                               retries=args.retries)
+    try:
+        results = scheduled.run([account for account in accounts if account.user in locks], args.at,
+                                warmup=args.warmup)
+    finally:
+        for lock in locks.values():
+            lock.release()
+    failures.update(scheduled.failures)
+
+    for account in accounts:
+        print_header(account)
+        if account.user in skipped:
+            print(f"SKIPPED!! -- another run is applying for this account, {skipped[account.user]}")
+            if apply_results is not None:
+                apply_results[account.user] = {args.company_share_id[0]: SKIPPED}
+        elif account.user in failures:
+            print(f"FAILED!! -- {failures[account.user]}")
         else:
-            _item['allotmentStatus'] = 'N/A'
+            print(results[account.user])
+
+    return failures
+
+
+def run_watcher(accounts, args, session_options):
+    """
+    Logs in every account once and keeps watching the open issues and allotments until interrupted.
+
+    :return: dict of user -> exception for the accounts that couldn't be logged in
+    """
+    from watcher import IssueWatcher, JsonlSink, WebhookSink, print_event
+
+    sessions, failures = {}, {}
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(UserSession, account=account, **session_options): account for account in accounts}
+        for future in as_completed(futures):
+            account = futures[future]
+            try:
+                sessions[account.user] = future.result()
+            except Exception as e:
+                failures[account.user] = e
+                print(f"FAILED!! {account.user} -- {e}")
+
+    probe_user = args.probe_user or next((account.user for account in accounts if account.user in sessions), None)
+    if probe_user not in sessions:
+        raise ValueError(f"Probe account '{probe_user}' could not be logged in")
+
+    sinks = [print_event]
+    if args.events:
+        sinks.append(JsonlSink(args.events))
+    if args.webhook:
+        sinks.append(WebhookSink(args.webhook))
+
+    watcher = IssueWatcher(sessions[probe_user], [sessions[account.user] for account in accounts
+                                                  if account.user in sessions],
+                           sinks, interval=args.interval, jitter=args.jitter,
+                           closing_window=timedelta(hours=args.closing_window),
+                           allotment_interval=args.allotment_interval,
+                           auto_apply_shares=args.number_of_shares if args.auto_apply else None, workers=args.workers,
+                           lock_dir=args.lock_dir)
+    print(f"Watching open issues with {probe_user} for {len(sessions)} accounts, press Ctrl+C to stop")
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for sink in sinks[1:]:
+            sink.close()
+
+    return failures
+
+
+def print_history_stats(args):
+    store = HistoryStore(args.history_db, create=False)
+    rows = store.allotment_rates(group_by=args.history_stats, account=args.user)
+    store.close()
+    print(f"{args.history_stats:<24}{'results':>9}{'alloted':>9}{'rate':>8}")
+    for group, total, alloted, rate in rows:
+        print(f"{group or '-':<24}{total:>9}{alloted:>9}{rate:>8.1%}")
 
-        return _item
+
+def print_apply_matrix(accounts, apply_results):
+    """
+    Prints the apply status of every account (rows) for every issue (columns).
+    """
+    company_share_ids = sorted({company_share_id for statuses in apply_results.values()
+                                for company_share_id in statuses})
+    if not company_share_ids:
+        return
+
+    print("=========  Apply results  =========")
+    width = max(len(status) for status in (APPLIED, ALREADY_APPLIED, CANNOT_APPLY, APPLY_UNSUCCESSFUL, ISSUE_NOT_FOUND,
+                                             DRY_RUN, SKIPPED))
+    print(f"{'user':<20}" + "".join(f"{company_share_id:>{width + 2}}" for company_share_id in company_share_ids))
+    for account in accounts:
+        statuses = apply_results.get(account.user, {})
+        print(f"{account.user:<20}" + "".join(f"{statuses.get(company_share_id, '-'):>{width + 2}}"
+                                              for company_share_id in company_share_ids))
+
+
+def skipped_accounts(apply_results):
+    """
+    :return: users skipped for at least one issue because another run held their lock
+    """
+    return [user for user, statuses in apply_results.items() if SKIPPED in statuses.values()]
+
+
+def print_summary(accounts, failures, transport, file=None, skipped=()):
+    """
+    :param skipped: users another run was applying for, counted as not completed
+    """
+    print("=========  Summary  =========", file=file)
+    print(f"{len(accounts) - len(failures) - len(skipped)}/{len(accounts)} accounts completed"
+          f"{f', {len(skipped)} skipped' if skipped else ''}", file=file)
+    print(f"HTTP: {transport.summary()}", file=file)
+    if transport.limiter:
+        print(*transport.limiter.summary(), sep="\n", file=file)
+    if transport.profiler:
+        print(*transport.profiler.report(), sep="\n", file=file)
+    for user, error in failures.items():
+        print(f"FAILED!! {user} -- {error}", file=file)
+    for user in skipped:
+        print(f"SKIPPED!! {user} -- another run was applying for this account", file=file)
 
 
 if __name__ == '__main__':
@@ -357,28 +1059,219 @@ if __name__ == '__main__':
     name_arg = parser.add_argument('-u', '--user',
                                    help='Run script for this user only, default is run for all users in accounts.csv '
                                         'file')
-    share_id_arg = parser.add_argument('-c', '--company-share-id',
-                                       help='Company share ID to apply, required when -a/--apply flag is set', type=int)
+    parser.add_argument('--accounts', help='Accounts file, a CSV file or a .db/.sqlite account store, default is '
+                                           f'{constants.ACCOUNTS_CSV_PATH}', default=constants.ACCOUNTS_CSV_PATH)
+    parser.add_argument('--shard', type=parse_shard, metavar='K/N',
+                        help='Only run the Kth of N shards of the accounts, e.g. 3/8, every account is in exactly one '
+                             'shard')
+    parser.add_argument('--lock-dir', default=constants.LOCK_DIRECTORY,
+                        help='Directory of the per account lock files held while applying, default is '
+                             f'{constants.LOCK_DIRECTORY}')
+    parser.add_argument('--merge', nargs='+', metavar='FILE',
+                        help='Combine the result files of several --shard runs, written with --format jsonl or csv, '
+                             'into one and exit')
+    parser.add_argument('--check-accounts', action='store_true', help='Validate the accounts file and exit')
+    parser.add_argument('--import-accounts', metavar='DB', help='Save the validated accounts to a .db/.sqlite '
+                                                                'account store and exit')
+    share_id_arg = parser.add_argument('-c', '--company-share-id', nargs='+', type=int,
+                                       help='Company share IDs to apply, required when -a/--apply flag is set '
+                                            'without --all-unapplied')
+    parser.add_argument('--all-unapplied', action='store_true',
+                        help='With -a/--apply, apply to every open ordinary share issue not applied yet')
     parser.add_argument('-n', '--number-of-shares', help='Number of shares to apply, default is 10', default=10)
+    parser.add_argument('--at', type=parse_at,
+                        help='With -a/--apply, wait and apply at this time (HH:MM or YYYY-MM-DDTHH:MM, local time)')
+    parser.add_argument('--warmup', type=int, default=120,
+                        help='Seconds before --at to log in the accounts and prepare the applications, default is 120')
+    parser.add_argument('--rate', type=float, help='Maximum apply requests per second with --at, default is no limit')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running and report new issues, issues closing soon and new allotments')
+    parser.add_argument('--interval', type=float, default=60,
+                        help='With --watch, seconds between two open issue polls, default is 60')
+    parser.add_argument('--jitter', type=float, default=10,
+                        help='With --watch, random seconds added to or removed from each interval, default is 10')
+    parser.add_argument('--probe-user', help='With --watch, user polling the open issues, default is the first account')
+    parser.add_argument('--closing-window', type=float, default=24,
+                        help='With --watch, hours before an issue closes to report it as closing soon, default is 24')
+    parser.add_argument('--allotment-interval', type=float, default=3600,
+                        help='With --watch, seconds between two allotment checks of all accounts, default is 3600')
+    parser.add_argument('--events', metavar='JSONL', help='With --watch, also append every event to this JSONL file')
+    parser.add_argument('--webhook', metavar='URL', help='With --watch, also POST every event as JSON to this URL')
+    parser.add_argument('--auto-apply', action='store_true',
+                        help='With --watch, apply -n/--number-of-shares to every new ordinary share IPO for all '
+                             'accounts')
+    parser.add_argument('--sync-history', action='store_true',
+                        help='Save new applications and allotment results to the local history database')
+    parser.add_argument('--history-stats', choices=['account', 'scrip'],
+                        help='Print the allotment rate per account or per scrip from the local history database, '
+                             'without any network calls')
+    parser.add_argument('--history-db', help=f'Local history database, default is {constants.HISTORY_DB_PATH}',
+                        default=constants.HISTORY_DB_PATH)
+    parser.add_argument('--from', dest='start_date', type=date.fromisoformat,
+                        help='Report applications made on or after this date (YYYY-MM-DD), default is 60 days ago')
+    parser.add_argument('--to', dest='end_date', type=date.fromisoformat,
+                        help='Report applications made on or before this date (YYYY-MM-DD), default is today')
+    parser.add_argument('--format', choices=FORMATS, default='text',
+                        help='Output format of the open issues, reports and apply results: the original text, one JSON '
+                             'object per line, CSV or an aligned table, default is text')
+    parser.add_argument('-o', '--output', help='Write the results to this file instead of stdout')
+    parser.add_argument('--page-size', help='Number of issues or applications to fetch per request, default is 20',
+                        type=int, default=20)
+    parser.add_argument('-w', '--workers', help='Number of accounts to run concurrently, default is 4', type=int,
+                        default=4)
+    parser.add_argument('--detail-workers', help='Number of allotment details to fetch concurrently per account, '
+                                                 'default is 4', type=int, default=4)
+    parser.add_argument('--api-url', help=f'MeroShare API base URL, default is {constants.API_BASE_URL}',
+                        default=constants.API_BASE_URL)
+    parser.add_argument('--pool-size', help='Maximum number of pooled connections to the MeroShare backend, '
+                                            'default is workers x detail workers', type=int)
+    parser.add_argument('--timeout', help='Read timeout in seconds for each request, default is 30', type=float,
+                        default=30)
+    parser.add_argument('--retries', help='Number of retries on server errors and connection resets, default is 3',
+                        type=int, default=3)
+    parser.add_argument('--rate-limit', type=float, default=50,
+                        help='Starting requests per second per endpoint, adapted to the backend response times and '
+                             'errors, 0 disables rate limiting, default is 50. The applications sent at --at are only '
+                             'limited by --rate')
+    parser.add_argument('--max-rate-limit', type=float,
+                        help='Maximum requests per second per endpoint, default is 4 x --rate-limit')
+    parser.add_argument('--breaker-threshold', type=int, default=10,
+                        help='Consecutive server errors after which all requests are paused, default is 10')
+    parser.add_argument('--breaker-cooldown', type=float, default=30,
+                        help='Seconds to pause all requests for once the backend looks down, default is 30')
+    parser.add_argument('--record', metavar='JSONL',
+                        help='Save every request with its response to this fixture file, credentials and PINs redacted')
+    parser.add_argument('--replay', metavar='JSONL',
+                        help='Answer every request from this fixture file instead of the MeroShare backend')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='With -a/--apply or --watch --auto-apply, build and validate the applications without '
+                             'sending them')
+    parser.add_argument('--profile', action='store_true', help='Print request timings per endpoint at the end')
+    parser.add_argument('--trace', metavar='JSONL', help='Append every request with its timing to this JSONL file')
+    parser.add_argument('--session-ttl', help=f'Seconds to reuse a cached login for, default is '
+                                              f'{constants.SESSION_CACHE_TTL}',
+                        type=int, default=constants.SESSION_CACHE_TTL)
+    parser.add_argument('--no-session-cache', action='store_true',
+                        help='Always log in instead of reusing the cached login')
     args = parser.parse_args()
 
-    accounts = find_accounts_from_csv(args.user)
+    if args.workers < 1 or args.detail_workers < 1 or args.page_size < 1:
+        parser.error('-w/--workers, --detail-workers and --page-size must be at least 1')
 
-    for account in accounts:
-        print(f"=========  %s  =========" % account.user.capitalize())
-
-        user = UserSession(account=account)
-
-        if args.report:
-            report = user.generate_reports()
-            for item in report:
-                print(f"{item['companyName']} - {item['allotmentStatus']}")
-        elif args.apply:
-            if not args.company_share_id:
-                raise argparse.ArgumentError(share_id_arg, "is required when -a/--apply flag is set, run the "
-                                                           "script without any args to find the open issues with "
-                                                           "their company share id")
-            user.apply(args.number_of_shares, company_share_id=args.company_share_id)
+    if args.history_stats:
+        print_history_stats(args)
+        raise SystemExit(0)
+
+    if args.merge:
+        output = open(args.output, 'w', newline='') if args.output else sys.stdout
+        try:
+            counts = merge_results(args.merge, args.format, output, integer_fields=INTEGER_RECORD_FIELDS)
+        except ValueError as e:
+            parser.error(str(e))
+        finally:
+            if args.output:
+                output.close()
+        print(f"{sum(counts)} results merged from {len(counts)} files", file=sys.stderr)
+        raise SystemExit(0)
+
+    if args.check_accounts:
+        print(f"{sum(1 for _ in iter_accounts(args.accounts))} valid accounts in {args.accounts}")
+        raise SystemExit(0)
+
+    if args.import_accounts:
+        if not is_account_store(args.import_accounts):
+            parser.error('--import-accounts must be a .db, .sqlite or .sqlite3 file')
+        store = AccountStore(args.import_accounts, create=True)
+        print(f"{store.save(vars(account) for account in iter_accounts(args.accounts))} accounts saved to "
+              f"{args.import_accounts}")
+        store.close()
+        raise SystemExit(0)
+
+    if args.watch and (args.apply or args.report or args.sync_history):
+        parser.error('--watch can\'t be combined with -a/--apply, -r/--report or --sync-history')
+
+    if args.shard and args.user:
+        parser.error('--shard can\'t be combined with -u/--user')
+
+    if args.record and args.replay:
+        parser.error('--record and --replay can\'t be combined')
+
+    if args.dry_run and (args.at or not (args.apply or args.auto_apply)):
+        parser.error('--dry-run requires -a/--apply or --auto-apply, without --at')
+
+    if args.format != 'text' and (args.watch or args.at):
+        parser.error('--format can\'t be combined with --watch or --at')
+
+    if args.auto_apply and not args.watch:
+        parser.error('--auto-apply requires --watch')
+
+    if args.at and not args.apply:
+        parser.error('--at requires -a/--apply')
+
+    if args.at and (args.all_unapplied or not args.company_share_id or len(args.company_share_id) != 1):
+        parser.error('--at requires a single -c/--company-share-id')
+
+    if args.apply and not args.company_share_id and not args.all_unapplied:
+        raise argparse.ArgumentError(share_id_arg, "is required when -a/--apply flag is set, run the "
+                                                   "script without any args to find the open issues with "
+                                                   "their company share id")
+
+    accounts = find_accounts_from_csv(args.user, args.accounts, args.shard)
+
+    # the HTTP stack takes longer to import than everything above, only pay for it once requests are about to be sent
+    from fixtures import FixtureRecorder, ReplayAdapter
+    from transport import Transport
+
+    transport = Transport(base_url=args.api_url, pool_size=args.pool_size or args.workers * args.detail_workers,
+                          read_timeout=args.timeout, retries=args.retries,
+                          profiler=RequestProfiler(args.trace) if args.profile or args.trace else None,
+                          limiter=AdaptiveRateLimiter(
+                              rate=args.rate_limit, max_rate=args.max_rate_limit,
+                              breaker=CircuitBreaker(args.breaker_threshold, args.breaker_cooldown)
+                          ) if args.rate_limit and not args.replay else None,
+                          recorder=FixtureRecorder(args.record) if args.record else None,
+                          adapter=ReplayAdapter(args.replay, args.api_url) if args.replay else None)
+    # recorded and replayed runs send every request, not only the ones missing from the caches
+    use_caches = not (args.record or args.replay)
+    session_options = {
+        'transport': transport,
+        'session_cache': SessionCache(ttl=args.session_ttl) if use_caches and not args.no_session_cache else None,
+        'allotment_cache': AllotmentCache() if use_caches else None,
+        'detail_workers': args.detail_workers,
+        'page_size': args.page_size,
+        'catalog': IssueCatalog(),
+        'dry_run': args.dry_run
+    }
+    apply_results = {}
+    try:
+        if args.watch:
+            failures = run_watcher(accounts, args, session_options)
+        elif args.at:
+            failures = run_scheduled_apply(accounts, args, session_options, apply_results)
         else:
-            open_issues = user.open_issues()
-            print(*open_issues, sep="\n")
+            output = open(args.output, 'w', newline='') if args.output else sys.stdout
+            writer = create_writer(args.format, result_fields(args), output)
+            try:
+                failures = run_accounts(accounts, args, session_options, writer, apply_results)
+            finally:
+                writer.close()
+                if args.output:
+                    output.close()
+            if args.format == 'text':
+                print_apply_matrix(accounts, apply_results)
+        # keep stdout to the results alone for the machine readable formats
+        skipped = skipped_accounts(apply_results)
+        print_summary(accounts, failures, transport, file=sys.stdout if args.format == 'text' else sys.stderr,
+                      skipped=skipped)
+    finally:
+        for file_cache in (session_options['session_cache'], session_options['allotment_cache']):
+            if file_cache:
+                file_cache.flush()
+        transport.close()
+        if transport.profiler:
+            transport.profiler.close()
+        if transport.recorder:
+            transport.recorder.close()
+
+    if failures or skipped:
+        raise SystemExit(1)
@@ -0,0 +1,297 @@
+"""
+Local stand-in for the MeroShare backend endpoints used by main.py, for benchmarks and offline testing.
+
+    python3 mock_server.py --accounts 100 --latency 0.05 --error-rate 0.01 --write-accounts mock_accounts.csv
+    python3 main.py --api-url http://127.0.0.1:8000/api/meroShare --accounts mock_accounts.csv
+"""
+import argparse
+import csv
+import json
+import random
+import re
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import constants
+
+API_PREFIX = '/api/meroShare'
+MOCK_DP = constants.CAPITALS[0]
+MOCK_BANK = {"code": "0001", "id": 1, "name": "Mock Bank Ltd."}
+
+
+def mock_accounts(count):
+    """
+    :return: list of account rows in the accounts.csv format, valid for a backend with the same number of accounts
+    """
+    return [
+        {
+            'user': f"user{i}",
+            'dp': MOCK_DP['code'],
+            'username': f"{i:08d}",
+            'password': 'password',
+            'crn': f"CRN{i:05d}",
+            'pin': '1234'
+        }
+        for i in range(count)
+    ]
+
+
+class MockBackend:
+    """
+    In-memory state of the mock backend: accounts, open issues, applications and their allotment results.
+    """
+
+    def __init__(self, accounts=100, issues=3, applications=10, latency=0.0, jitter=0.0, error_rate=0.0,
+                 drop_rate=0.0, seed=0):
+        self.accounts = {row['username']: row for row in mock_accounts(accounts)}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.issues = [self._issue(company_share_id) for company_share_id in range(1, issues + 1)]
+        self.applications_per_account = applications
+        self.applied = set()
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _issue(company_share_id):
+        today = date.today()
+        return {
+            "companyShareId": company_share_id,
+            "subGroup": "For General Public",
+            "scrip": f"MCK{company_share_id}",
+            "companyName": f"Mock Company {company_share_id} Limited",
+            "shareTypeName": "IPO",
+            "shareGroupName": "Ordinary Shares",
+            "statusName": "CREATE_APPROVE",
+            "issueOpenDate": f"{today - timedelta(days=1)} 10:00:00 AM",
+            "issueCloseDate": f"{today + timedelta(days=3)} 5:00:00 PM",
+        }
+
+    def applications(self, username):
+        today = date.today()
+        base_id = int(username) * self.applications_per_account
+        return [
+            {
+                "applicantFormId": base_id + i,
+                "companyName": f"Mock Company {i} Limited",
+                "scrip": f"MCK{i}",
+                "shareTypeName": "IPO",
+                "shareGroupName": "Ordinary Shares",
+                "subGroup": "For General Public",
+                "statusName": "TRANSACTION_SUCCESS" if i % 5 else "BLOCK_FAILED",
+                "appliedDate": str(today - timedelta(days=i * 3)),
+            }
+            for i in range(self.applications_per_account)
+        ]
+
+    @staticmethod
+    def allotment_status(application_id):
+        return "Alloted" if application_id % 3 == 0 else "Not Alloted"
+
+    def simulate(self):
+        """
+        Sleeps for the configured latency and picks the injected failure, if any.
+
+        :return: None, 'error' or 'drop'
+        """
+        with self._lock:
+            self.requests += 1
+            delay = max(self.latency + self.random.uniform(-self.jitter, self.jitter), 0)
+            roll = self.random.random()
+        time.sleep(delay)
+        if roll < self.drop_rate:
+            return 'drop'
+        if roll < self.drop_rate + self.error_rate:
+            return 'error'
+        return None
+
+    def apply(self, username, company_share_id):
+        with self._lock:
+            if (username, company_share_id) in self.applied:
+                return False
+            self.applied.add((username, company_share_id))
+            return True
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately, don't let Nagle's algorithm hold the body back on keep-alive
+    disable_nagle_algorithm = True
+    backend = None
+
+    routes = [
+        ('POST', re.compile(r'^/auth/$'), 'auth'),
+        ('GET', re.compile(r'^/bank/$'), 'banks'),
+        ('GET', re.compile(r'^/bank/(\d+)$'), 'bank'),
+        ('POST', re.compile(r'^/companyShare/applicableIssue/$'), 'applicable_issues'),
+        ('GET', re.compile(r'^/applicantForm/customerType/(\d+)/(\d+)$'), 'customer_type'),
+        ('POST', re.compile(r'^/applicantForm/share/apply$'), 'apply'),
+        ('POST', re.compile(r'^/applicantForm/active/search/$'), 'search'),
+        ('GET', re.compile(r'^/applicantForm/report/detail/(\d+)$'), 'report_detail'),
+    ]
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def dispatch(self, method):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        failure = self.backend.simulate()
+        if failure == 'drop':
+            self.close_connection = True
+            return
+        if failure == 'error':
+            return self.respond(503, {"message": "Service Unavailable"})
+
+        path = self.path[len(API_PREFIX):] if self.path.startswith(API_PREFIX) else self.path
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if match and route_method == method:
+                data = json.loads(body) if body else None
+                username = None
+                if handler != 'auth':
+                    username = self.authenticated_username()
+                    if username is None:
+                        return self.respond(401, {"message": "Unauthorized"})
+                return getattr(self, handler)(username, data, *match.groups())
+
+        self.respond(404, {"message": "Not Found"})
+
+    def authenticated_username(self):
+        token = self.headers.get('Authorization') or ''
+        username = token.removeprefix('mock-token-')
+        return username if username in self.backend.accounts else None
+
+    def respond(self, status, data, headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def paginated(self, data, objects):
+        page, size = data.get('page', 1), data.get('size', 20)
+        self.respond(200, {"object": objects[(page - 1) * size:page * size], "totalCount": len(objects)})
+
+    def auth(self, _, data):
+        account = self.backend.accounts.get(data.get('username'))
+        if not account or account['password'] != data.get('password') or data.get('clientId') != MOCK_DP['id']:
+            return self.respond(401, {"message": "Invalid credentials"})
+        self.respond(200, {"message": "Log in successful."},
+                     headers={'Authorization': f"mock-token-{account['username']}"})
+
+    def banks(self, *_):
+        self.respond(200, [MOCK_BANK])
+
+    def bank(self, username, _, bank_id):
+        self.respond(200, [{
+            "accountBranchId": 1,
+            "accountNumber": f"0001{username}",
+            "accountTypeId": 1,
+            "accountTypeName": "SAVING ACCOUNT",
+            "branchName": "Mock Bank Ltd. -Main Branch",
+            "id": int(username)
+        }])
+
+    def applicable_issues(self, username, data):
+        objects = [{**issue, "action": "edit" if (username, issue['companyShareId']) in self.backend.applied else None}
+                   for issue in self.backend.issues]
+        self.paginated(data, objects)
+
+    def customer_type(self, username, _, company_share_id, demat):
+        if (username, int(company_share_id)) in self.backend.applied:
+            return self.respond(200, {"message": "Customer has already applied."})
+        self.respond(200, {"message": "Customer can apply."})
+
+    def apply(self, username, data):
+        if self.backend.accounts[username]['pin'] != data.get('transactionPIN'):
+            return self.respond(400, {"message": "Invalid transaction PIN."})
+        if not self.backend.apply(username, int(data['companyShareId'])):
+            return self.respond(409, {"message": "Already applied."})
+        self.respond(201, {"message": "Share has been applied successfully."})
+
+    def search(self, username, data):
+        self.paginated(data, self.backend.applications(username))
+
+    def report_detail(self, _, __, application_id):
+        self.respond(200, {"statusName": self.backend.allotment_status(int(application_id))})
+
+
+class MockServer:
+    """
+    Runs a `MockBackend` on a background thread, usable as a context manager.
+    """
+
+    def __init__(self, backend, host='127.0.0.1', port=0):
+        handler = type('Handler', (MockRequestHandler,), {'backend': backend})
+        self.backend = backend
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *_):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Mock MeroShare backend')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--accounts', type=int, default=100, help='Number of accounts, default is 100')
+    parser.add_argument('--issues', type=int, default=3, help='Number of open issues, default is 3')
+    parser.add_argument('--applications', type=int, default=10, help='Number of applications per account, '
+                                                                     'default is 10')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Random +/- seconds added to the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with a 503')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='Fraction of connections closed without a '
+                                                                     'response')
+    parser.add_argument('--write-accounts', metavar='CSV', help='Write the mock accounts to this accounts CSV file')
+    args = parser.parse_args()
+
+    if args.write_accounts:
+        with open(args.write_accounts, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=['user', 'dp', 'username', 'password', 'crn', 'pin'])
+            writer.writeheader()
+            writer.writerows(mock_accounts(args.accounts))
+
+    mock_backend = MockBackend(accounts=args.accounts, issues=args.issues, applications=args.applications,
+                               latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                               drop_rate=args.drop_rate)
+    server = MockServer(mock_backend, host=args.host, port=args.port)
+    print(f"Mock MeroShare backend listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
@@ -0,0 +1,169 @@
+import csv
+import json
+import sys
+from itertools import chain
+
+FORMATS = ('text', 'jsonl', 'csv', 'table')
+
+# terminal table column widths, longer values are cut
+COLUMN_WIDTHS = {'user': 16, 'company_name': 36, 'share_group': 16, 'subgroup': 24, 'issue_open_date': 22,
+                 'issue_close_date': 22, 'status': 26}
+DEFAULT_COLUMN_WIDTH = 14
+
+
+def print_header(account, file=None):
+    print(f"=========  %s  =========" % account.user.capitalize(), file=file)
+
+
+class TextWriter:
+    """
+    The script's original output, each account's results under its own header.
+    """
+
+    def __init__(self, fields=(), file=None):
+        self.file = file or sys.stdout
+
+    def start_account(self, account):
+        print_header(account, file=self.file)
+
+    def write(self, account, record):
+        print(record, file=self.file)
+
+    def failed(self, account, error):
+        print(f"FAILED!! -- {error}", file=self.file)
+
+    def close(self):
+        self.file.flush()
+
+
+class RecordWriter:
+    """
+    Writes every result as one row of `fields`, prefixed with the user. Results are written as they come in, plain
+    string results are notes for the terminal only and are skipped. Failures go to stderr.
+    """
+
+    def __init__(self, fields, file=None):
+        self.fields = ('user', *fields)
+        self.file = file or sys.stdout
+
+    def start_account(self, account):
+        pass
+
+    def write(self, account, record):
+        if not isinstance(record, str):
+            self.write_row({'user': account.user, **record.to_record()})
+
+    def write_row(self, row):
+        raise NotImplementedError
+
+    def failed(self, account, error):
+        print(f"FAILED!! {account.user} -- {error}", file=sys.stderr)
+
+    def close(self):
+        self.file.flush()
+
+
+class JsonlWriter(RecordWriter):
+    def write_row(self, row):
+        self.file.write(json.dumps(row) + '\n')
+
+
+class CsvWriter(RecordWriter):
+    def __init__(self, fields, file=None):
+        super().__init__(fields, file)
+        self.writer = csv.DictWriter(self.file, fieldnames=self.fields)
+        self.writer.writeheader()
+
+    def write_row(self, row):
+        self.writer.writerow(row)
+
+
+class TableWriter(RecordWriter):
+    """
+    Aligned table with fixed column widths, so rows can be printed as they come in.
+    """
+
+    def __init__(self, fields, file=None):
+        super().__init__(fields, file)
+        self.widths = [max(COLUMN_WIDTHS.get(field, DEFAULT_COLUMN_WIDTH), len(field)) for field in self.fields]
+        self.write_line(self.fields)
+        self.write_line('-' * width for width in self.widths)
+
+    def write_line(self, values):
+        cells = []
+        for value, width in zip(values, self.widths):
+            value = '' if value is None else str(value)
+            cells.append(value if len(value) <= width else value[:width - 1] + '~')
+            cells[-1] = cells[-1].ljust(width)
+        print('  '.join(cells).rstrip(), file=self.file)
+
+    def write_row(self, row):
+        self.write_line(row.get(field) for field in self.fields)
+
+
+WRITERS = {'text': TextWriter, 'jsonl': JsonlWriter, 'csv': CsvWriter, 'table': TableWriter}
+
+
+def create_writer(output_format, fields, file=None):
+    """
+    :param fields: names of the fields of the results, in column order
+    """
+    return WRITERS[output_format](fields, file)
+
+
+def read_results(path, integer_fields=()):
+    """
+    Iterates over the rows of a result file written with `--format csv`, for a .csv file, or `--format jsonl`.
+
+    :param integer_fields: fields converted back to int when read from a CSV file, empty CSV values are read as None
+    """
+    with open(path, newline='') as file:
+        if path.endswith('.csv'):
+            for row in csv.DictReader(file):
+                yield {field: None if value == '' else int(value) if field in integer_fields else value
+                       for field, value in row.items()}
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def merge_results(paths, output_format, file=None, integer_fields=()):
+    """
+    Combines the result files of several shards into one, file by file without loading them whole. Every non-empty
+    file must have the same fields, the text format is written as a table. Users found in more than one file, or twice
+    in a file given more than once, are reported on stderr, shards never share accounts.
+
+    :param integer_fields: fields of the results that are integers, see `read_results`
+    :return: list of the number of rows of each file, in the order of `paths`
+    """
+    results = [read_results(path, integer_fields) for path in paths]
+    first_rows = [next(rows, None) for rows in results]
+    first_row = next((row for row in first_rows if row is not None), None)
+    counts = [0] * len(paths)
+    if first_row is None:
+        return counts
+
+    first_path = paths[first_rows.index(first_row)]
+    for path, row in zip(paths, first_rows):
+        if row is not None and list(row) != list(first_row):
+            raise ValueError(f"{path} has the fields {', '.join(row)}, {first_path} has {', '.join(first_row)}, "
+                             f"only results of the same action can be merged")
+
+    writer = create_writer('table' if output_format == 'text' else output_format,
+                           [field for field in first_row if field != 'user'], file)
+    files_by_user = {}
+    try:
+        for index, (path, rows) in enumerate(zip(paths, results)):
+            if first_rows[index] is None:
+                continue
+            for row in chain([first_rows[index]], rows):
+                user = row.get('user')
+                if files_by_user.setdefault(user, index) != index:
+                    print(f"DUPLICATE!! {user} -- in {paths[files_by_user[user]]} and {path}", file=sys.stderr)
+                    files_by_user[user] = index
+                writer.write_row(row)
+                counts[index] += 1
+    finally:
+        writer.close()
+    return counts
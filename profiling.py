@@ -0,0 +1,81 @@
+import json
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+
+ID_SEGMENT = re.compile(r'/\d+')
+
+
+def endpoint_name(method, path):
+    """
+    :return: the request grouped by endpoint, e.g. "GET bank/{id}" for "bank/123"
+    """
+    return f"{method} {ID_SEGMENT.sub('/{id}', '/' + path.lstrip('/'))[1:]}"
+
+
+def percentile(values, p):
+    """
+    :return: nearest-rank percentile of the values, 0 when there are none
+    """
+    if not values:
+        return 0
+    ordered = sorted(values)
+    index = max(math.ceil(p / 100 * len(ordered)) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+class RequestProfiler:
+    """
+    Records the endpoint, account, status, latency and size of every HTTP request sent by the `Transport`, and
+    optionally writes each one as a JSON line to `trace_path`.
+    """
+
+    def __init__(self, trace_path=None):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.bytes = defaultdict(int)
+        self._lock = threading.Lock()
+        self._trace = open(trace_path, 'a') if trace_path else None
+
+    def record(self, method, path, account, status, latency, bytes_sent=0, bytes_received=0):
+        """
+        :param status: HTTP status code, or the exception name when no response was received
+        """
+        endpoint = endpoint_name(method, path)
+        failed = not isinstance(status, int) or status >= 400
+        with self._lock:
+            self.latencies[endpoint].append(latency)
+            self.bytes[endpoint] += bytes_sent + bytes_received
+            if failed:
+                self.errors[endpoint] += 1
+            if self._trace:
+                self._trace.write(json.dumps({
+                    'time': time.time(),
+                    'endpoint': endpoint,
+                    'path': path,
+                    'account': account,
+                    'status': status,
+                    'latency': round(latency, 6),
+                    'bytes_sent': bytes_sent,
+                    'bytes_received': bytes_received
+                }) + '\n')
+
+    def report(self):
+        """
+        :return: lines of the per endpoint timing table, slowest total first
+        """
+        lines = [f"{'endpoint':<48}{'count':>7}{'errors':>7}{'total s':>10}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}"
+                 f"{'bytes':>10}"]
+        with self._lock:
+            rows = sorted(self.latencies.items(), key=lambda item: sum(item[1]), reverse=True)
+            for endpoint, latencies in rows:
+                lines.append(f"{endpoint:<48}{len(latencies):>7}{self.errors[endpoint]:>7}{sum(latencies):>10.2f}"
+                             f"{percentile(latencies, 50) * 1000:>9.1f}{percentile(latencies, 95) * 1000:>9.1f}"
+                             f"{max(latencies) * 1000:>9.1f}{self.bytes[endpoint]:>10}")
+        return lines
+
+    def close(self):
+        if self._trace:
+            self._trace.close()
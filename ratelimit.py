@@ -0,0 +1,141 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Allows `rate` calls per second on average and bursts of up to `burst` calls, across all threads.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and makes every caller of `wait` pause for `cooldown` seconds. Then a
+    single probe request is let through, the breaker closes again when it succeeds and re-opens when it fails.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, threshold=10, cooldown=30):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self._opened_at = 0
+        self._probe_started_at = None
+        self._condition = threading.Condition()
+
+    def wait(self):
+        with self._condition:
+            while self.state != self.CLOSED:
+                now = time.monotonic()
+                remaining = self._opened_at + self.cooldown - now
+                if self.state == self.OPEN and remaining > 0:
+                    self._condition.wait(remaining)
+                # a probe that never reported back doesn't block the others forever
+                elif self._probe_started_at is None or now - self._probe_started_at > self.cooldown:
+                    self.state = self.HALF_OPEN
+                    self._probe_started_at = now
+                    return
+                else:
+                    self._condition.wait(self.cooldown)
+
+    def record(self, ok):
+        with self._condition:
+            if ok:
+                self.failures = 0
+                if self.state != self.CLOSED:
+                    self.state = self.CLOSED
+                    self._probe_started_at = None
+                    self._condition.notify_all()
+                return
+
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.threshold):
+                self.state = self.OPEN
+                self.trips += 1
+                self._opened_at = time.monotonic()
+                self._probe_started_at = None
+                self._condition.notify_all()
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket per endpoint shared by all workers. An endpoint's rate is halved when it answers with a server error,
+    throttles (429) or responds slower than `slow_latency` seconds, and grows back by `increase` per second-worth of
+    successful requests, between `min_rate` and `max_rate`. A `CircuitBreaker` shared by all endpoints pauses every
+    worker when the backend looks down.
+    """
+
+    def __init__(self, rate=50, burst=None, min_rate=1, max_rate=None, slow_latency=5.0, increase=1.0,
+                 breaker=None):
+        self.rate = rate
+        self.burst = burst or max(int(rate), 1)
+        self.min_rate = min_rate
+        self.max_rate = max_rate or rate * 4
+        self.slow_latency = slow_latency
+        self.increase = increase
+        self.breaker = breaker or CircuitBreaker()
+        self.buckets = {}
+        self.backoffs = {}
+        self._last_backoff_at = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, endpoint):
+        with self._lock:
+            if endpoint not in self.buckets:
+                self.buckets[endpoint] = TokenBucket(self.rate, self.burst)
+                self.backoffs[endpoint] = 0
+            return self.buckets[endpoint]
+
+    def acquire(self, endpoint):
+        self.breaker.wait()
+        self.bucket(endpoint).acquire()
+
+    def record(self, endpoint, status, latency):
+        """
+        :param status: HTTP status code, or the exception name when no response was received
+        """
+        bucket = self.bucket(endpoint)
+        server_ok = isinstance(status, int) and status < 500 and status != 429
+        self.breaker.record(server_ok)
+        with self._lock:
+            now = time.monotonic()
+            if not server_ok or latency > self.slow_latency:
+                # requests in flight when the backend slowed down all report back, back off once per second at most
+                if now - self._last_backoff_at.get(endpoint, 0) >= 1:
+                    bucket.rate = max(self.min_rate, bucket.rate / 2)
+                    self.backoffs[endpoint] += 1
+                    self._last_backoff_at[endpoint] = now
+            else:
+                bucket.rate = min(self.max_rate, bucket.rate + self.increase / bucket.rate)
+
+    def summary(self):
+        """
+        :return: lines describing the current rate of every endpoint and the circuit breaker
+        """
+        lines = [f"Circuit breaker: {self.breaker.state}, tripped {self.breaker.trips} times"]
+        with self._lock:
+            for endpoint, bucket in sorted(self.buckets.items()):
+                lines.append(f"{endpoint}: {bucket.rate:.1f} req/s, backed off {self.backoffs[endpoint]} times")
+        return lines
@@ -0,0 +1,132 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, time as clock_time
+
+from ratelimit import TokenBucket
+
+
+def parse_at(value, now=None):
+    """
+    :param value: "HH:MM[:SS]" for the next time the clock shows it, today or tomorrow, or an ISO datetime, in local
+                  time
+    :return: datetime
+    :raise argparse.ArgumentTypeError: when the datetime is in the past
+    """
+    now = now or datetime.now()
+    try:
+        at = datetime.combine(now.date(), clock_time.fromisoformat(value))
+        return at if at > now else at + timedelta(days=1)
+    except ValueError:
+        at = datetime.fromisoformat(value)
+    if at <= now:
+        raise argparse.ArgumentTypeError(f"'{value}' is in the past")
+    return at
+
+
+def sleep_until(target):
+    while (remaining := (target - datetime.now()).total_seconds()) > 0:
+        time.sleep(min(remaining, 30))
+
+
+class ScheduledApply:
+    """
+    Applies to an issue for many accounts right when it opens, in three phases:
+
+    1. prepare: log in every account and build its apply payload shortly before the open time
+    2. fire: at the open time send every apply request concurrently, rate limited and retried on server errors
+    3. confirm: check every account's open issues again to confirm the application went through
+    """
+
+    def __init__(self, create_session, company_share_id, number_of_shares, workers=16, rate=None, retries=3,
+                 retry_delay=1.0):
+        """
+        :param create_session: callable returning a logged in `UserSession` for an account
+        """
+        self.create_session = create_session
+        self.company_share_id = company_share_id
+        self.number_of_shares = number_of_shares
+        self.workers = workers
+        self.limiter = TokenBucket(rate) if rate else None
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.prepared = {}
+        self.results = {}
+        self.confirmed = set()
+        self.failures = {}
+
+    def _map(self, fn, items):
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(fn, item): item for item in items}
+            for future, item in futures.items():
+                try:
+                    yield item, future.result()
+                except Exception as e:
+                    yield item, e
+
+    def prepare(self, accounts):
+        def _prepare(account):
+            user = self.create_session(account)
+            return user, user.apply_payload(self.number_of_shares, self.company_share_id)
+
+        for account, result in self._map(_prepare, accounts):
+            if isinstance(result, Exception):
+                self.failures[account.user] = result
+            else:
+                self.prepared[account.user] = result
+
+    def _fire(self, prepared):
+        # imported here so that main.py can use `parse_at` without importing the HTTP stack
+        import requests
+
+        user, payload = prepared
+        for attempt in range(self.retries + 1):
+            if self.limiter:
+                self.limiter.acquire()
+            try:
+                # paced by --rate alone, the adaptive limiter would hold the applications back at the opening time
+                r = user.submit_apply(payload, limit=False)
+                if r.status_code < 500:
+                    return r.ok
+            except (requests.ConnectionError, requests.Timeout):
+                pass
+
+            if attempt == self.retries:
+                return False
+            time.sleep(self.retry_delay * (2 ** attempt))
+            # the failed request may still have gone through, never send a second application
+            if not user.can_apply(self.company_share_id):
+                return False
+
+    def fire(self):
+        for (user, _), result in self._map(self._fire, self.prepared.values()):
+            if isinstance(result, Exception):
+                self.failures[user.account.user] = result
+            else:
+                self.results[user.account.user] = result
+
+    def confirm(self):
+        users = [user for user, _ in self.prepared.values() if user.account.user in self.results]
+        for user, applied in self._map(lambda _user: _user.is_applied(self.company_share_id), users):
+            # keep the result of the apply request when the confirmation itself fails
+            if not isinstance(applied, Exception):
+                self.results[user.account.user] = applied
+                self.confirmed.add(user.account.user)
+
+    def run(self, accounts, at, warmup=120):
+        """
+        :param warmup: seconds before `at` to start logging in the accounts
+        :return: dict of user -> output line for every account that made it to the fire phase
+        """
+        sleep_until(at - timedelta(seconds=warmup))
+        self.prepare(accounts)
+        print(f"{len(self.prepared)}/{len(accounts)} accounts ready, applying at {at}")
+        sleep_until(at)
+        self.fire()
+        self.confirm()
+
+        return {
+            user: f"{'APPLIED SUCCESSFULLY' if applied else 'APPLY UNSUCCESSFUL'}!! -- {self.company_share_id}"
+                  f"{'' if user in self.confirmed else ' (unconfirmed)'}"
+            for user, applied in self.results.items()
+        }
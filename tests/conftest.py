@@ -0,0 +1,66 @@
+import argparse
+import os
+import sys
+
+import pytest
+
+# the scripts are flat modules at the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import Account, IssueCatalog  # noqa: E402
+from mock_server import MockBackend, MockServer, mock_accounts  # noqa: E402
+from transport import Transport  # noqa: E402
+
+ACCOUNTS = 4
+
+
+@pytest.fixture
+def backend():
+    return MockBackend(accounts=ACCOUNTS, issues=3, applications=25)
+
+
+@pytest.fixture
+def server(backend):
+    with MockServer(backend) as server:
+        yield server
+
+
+@pytest.fixture
+def transport(server):
+    transport = Transport(base_url=server.url, backoff_factor=0.01)
+    yield transport
+    transport.close()
+
+
+@pytest.fixture
+def accounts():
+    return [Account.from_row(row) for row in mock_accounts(ACCOUNTS)]
+
+
+@pytest.fixture
+def session_options(transport):
+    return {'transport': transport, 'detail_workers': 2, 'page_size': 10, 'catalog': IssueCatalog()}
+
+
+@pytest.fixture
+def run_args(tmp_path):
+    """
+    :return: function building the parsed arguments of main.py, listing the open issues unless overridden
+    """
+    def _run_args(**overrides):
+        args = {
+            'report': False,
+            'apply': False,
+            'sync_history': False,
+            'company_share_id': None,
+            'all_unapplied': False,
+            'number_of_shares': 10,
+            'start_date': None,
+            'end_date': None,
+            'lock_dir': str(tmp_path / 'locks'),
+            'workers': 2,
+        }
+        args.update(overrides)
+        return argparse.Namespace(**args)
+
+    return _run_args
@@ -0,0 +1,51 @@
+import io
+import json
+
+from fixtures import FixtureRecorder, ReplayAdapter
+from main import Application, IssueCatalog, run_accounts
+from mock_server import MockBackend, MockServer
+from output import JsonlWriter
+from transport import Transport
+
+
+def report(transport, accounts, run_args):
+    output = io.StringIO()
+    session_options = {'transport': transport, 'detail_workers': 2, 'page_size': 10, 'catalog': IssueCatalog()}
+    failures = run_accounts(accounts, run_args(report=True), session_options,
+                            JsonlWriter(Application.RECORD_FIELDS, output))
+    assert failures == {}
+    return sorted(output.getvalue().splitlines())
+
+
+def test_replay(tmp_path, accounts, run_args):
+    path = str(tmp_path / 'fixtures.jsonl')
+    with MockServer(MockBackend(accounts=len(accounts), applications=25)) as server:
+        url = server.url
+        recorder = FixtureRecorder(path)
+        transport = Transport(base_url=url, recorder=recorder)
+        recorded = report(transport, accounts, run_args)
+        transport.close()
+        recorder.close()
+
+    # the server is gone, every response comes from the fixture file
+    transport = Transport(base_url=url, adapter=ReplayAdapter(path, url))
+    replayed = report(transport, accounts, run_args)
+    transport.close()
+
+    assert replayed == recorded
+    assert len(recorded) == len(accounts) * 25
+
+
+def test_recording_has_no_secrets(tmp_path, accounts, run_args, server):
+    path = str(tmp_path / 'fixtures.jsonl')
+    recorder = FixtureRecorder(path)
+    transport = Transport(base_url=server.url, recorder=recorder)
+    report(transport, accounts[:1], run_args)
+    transport.close()
+    recorder.close()
+
+    with open(path) as file:
+        fixtures = [json.loads(line) for line in file]
+    auth = next(fixture for fixture in fixtures if fixture['path'] == 'auth/')
+    assert auth['body']['password'] == 'REDACTED'
+    assert 'mock-token-' not in json.dumps(fixtures)
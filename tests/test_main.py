@@ -0,0 +1,77 @@
+import io
+import json
+
+from locks import AccountLock
+from main import (ALREADY_APPLIED, APPLIED, ISSUE_NOT_FOUND, SKIPPED, ApplyResult, Application, Issue, UserSession,
+                  run_accounts, skipped_accounts)
+from output import JsonlWriter
+
+
+def run(accounts, args, session_options, fields):
+    output = io.StringIO()
+    apply_results = {}
+    failures = run_accounts(accounts, args, session_options, JsonlWriter(fields, output), apply_results)
+    assert failures == {}
+    return [json.loads(line) for line in output.getvalue().splitlines()], apply_results
+
+
+def test_list_open_issues(accounts, session_options, run_args):
+    rows, _ = run(accounts, run_args(), session_options, Issue.RECORD_FIELDS)
+
+    assert len(rows) == len(accounts) * 3
+    assert {row['company_share_id'] for row in rows} == {1, 2, 3}
+    assert {row['status'] for row in rows} == {'not applied'}
+
+
+def test_apply(backend, accounts, session_options, run_args):
+    backend.applied.add((accounts[0].username, 1))
+
+    rows, apply_results = run(accounts, run_args(apply=True, company_share_id=[1]), session_options,
+                              ApplyResult.RECORD_FIELDS)
+
+    assert apply_results[accounts[0].user] == {1: ALREADY_APPLIED}
+    assert all(apply_results[account.user] == {1: APPLIED} for account in accounts[1:])
+    assert backend.applied == {(account.username, 1) for account in accounts}
+    assert len(rows) == len(accounts)
+
+
+def test_apply_repeated_id_applies_once(backend, accounts, session_options, run_args):
+    _, apply_results = run(accounts[:1], run_args(apply=True, company_share_id=[1, 1, 2]), session_options,
+                           ApplyResult.RECORD_FIELDS)
+
+    assert apply_results[accounts[0].user] == {1: APPLIED, 2: APPLIED}
+    assert backend.applied == {(accounts[0].username, 1), (accounts[0].username, 2)}
+
+
+def test_apply_issue_open_for_another_account_only(accounts, session_options):
+    catalog = session_options['catalog']
+    catalog.add({"companyShareId": 7, "shareTypeName": "IPO", "shareGroupName": "Ordinary Shares"})
+    user = UserSession(account=accounts[0], **session_options)
+
+    assert user.find_issue(7) is None
+    assert user.apply_many(10, [7]) == {7: ISSUE_NOT_FOUND}
+
+
+def test_apply_skips_locked_account(backend, accounts, session_options, run_args):
+    args = run_args(apply=True, company_share_id=[1])
+    with AccountLock(accounts[1].user, args.lock_dir) as lock:
+        assert lock.acquire()
+        rows, apply_results = run(accounts, args, session_options, ApplyResult.RECORD_FIELDS)
+
+    assert {'user': accounts[1].user, 'company_share_id': 1, 'status': SKIPPED} in rows
+    assert skipped_accounts(apply_results) == [accounts[1].user]
+    assert (accounts[1].username, 1) not in backend.applied
+    assert len(backend.applied) == len(accounts) - 1
+
+
+def test_report_pages_through_applications(backend, accounts, session_options, run_args):
+    rows, _ = run(accounts[:2], run_args(report=True), session_options, Application.RECORD_FIELDS)
+
+    for account in accounts[:2]:
+        expected = {application['applicantFormId']: backend.allotment_status(application['applicantFormId'])
+                    for application in backend.applications(account.username)
+                    if application['statusName'] == 'TRANSACTION_SUCCESS'}
+        reported = {row['applicant_form_id']: row['allotment_status'] for row in rows if row['user'] == account.user
+                    and row['status_name'] == 'TRANSACTION_SUCCESS'}
+        assert reported == expected
+        assert sum(row['user'] == account.user for row in rows) == 25
@@ -0,0 +1,52 @@
+import io
+import json
+
+import pytest
+
+from main import INTEGER_RECORD_FIELDS
+from output import merge_results
+
+
+def write_jsonl(path, rows):
+    path.write_text(''.join(json.dumps(row) + '\n' for row in rows))
+    return str(path)
+
+
+def test_merge(tmp_path, capsys):
+    shard_1 = write_jsonl(tmp_path / 'shard-1.jsonl', [{'user': 'a', 'company_share_id': 1, 'status': 'APPLIED'}])
+    shard_2 = write_jsonl(tmp_path / 'shard-2.jsonl', [{'user': 'b', 'company_share_id': 1, 'status': 'APPLIED'}])
+    output = io.StringIO()
+
+    assert merge_results([shard_1, shard_2], 'jsonl', output) == [1, 1]
+    assert [json.loads(line)['user'] for line in output.getvalue().splitlines()] == ['a', 'b']
+    assert 'DUPLICATE' not in capsys.readouterr().err
+
+
+def test_merge_file_given_twice(tmp_path, capsys):
+    shard = write_jsonl(tmp_path / 'shard.jsonl', [{'user': 'a', 'status': 'APPLIED'}])
+
+    assert merge_results([shard, shard], 'jsonl', io.StringIO()) == [1, 1]
+    assert f"DUPLICATE!! a -- in {shard} and {shard}" in capsys.readouterr().err
+
+
+def test_merge_different_fields(tmp_path):
+    applied = write_jsonl(tmp_path / 'apply.jsonl', [{'user': 'a', 'company_share_id': 1, 'status': 'APPLIED'}])
+    report = write_jsonl(tmp_path / 'report.jsonl', [{'user': 'b', 'applicant_form_id': 2, 'scrip': 'MCK'}])
+    output = io.StringIO()
+
+    with pytest.raises(ValueError, match='report.jsonl has the fields'):
+        merge_results([applied, report], 'csv', output)
+    assert output.getvalue() == ''
+
+
+def test_merge_csv_to_jsonl_keeps_types(tmp_path):
+    shard = tmp_path / 'shard.csv'
+    shard.write_text('user,company_share_id,status\r\na,1,APPLIED\r\nb,,\r\n')
+    output = io.StringIO()
+
+    merge_results([str(shard)], 'jsonl', output, integer_fields=INTEGER_RECORD_FIELDS)
+
+    assert [json.loads(line) for line in output.getvalue().splitlines()] == [
+        {'user': 'a', 'company_share_id': 1, 'status': 'APPLIED'},
+        {'user': 'b', 'company_share_id': None, 'status': None},
+    ]
@@ -0,0 +1,55 @@
+import argparse
+from datetime import datetime
+
+import pytest
+
+from account_store import AccountStore
+from cache import SessionCache
+from history import HistoryStore
+from main import IssueCatalog
+from profiling import percentile
+from scheduler import parse_at
+
+
+def test_missing_stores_are_not_created(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        AccountStore(str(tmp_path / 'accounts.db'))
+    with pytest.raises(FileNotFoundError):
+        HistoryStore(str(tmp_path / 'history.db'), create=False)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_session_cache_writes_in_batches(tmp_path, accounts, monkeypatch):
+    cache = SessionCache(path=str(tmp_path / 'sessions.json'))
+    writes = []
+    monkeypatch.setattr(cache, '_write', lambda data: writes.append(dict(data)))
+
+    for account in accounts:
+        cache.set(account, 'token', {'id': 1})
+    assert writes == []
+    assert cache.get(accounts[0])['authorization'] == 'token'
+
+    cache.flush()
+    assert len(writes) == 1 and len(writes[0]) == len(accounts)
+
+
+def test_catalog_keeps_the_latest_issue_details():
+    catalog = IssueCatalog()
+    catalog.add({"companyShareId": 1, "issueCloseDate": "2024-04-25 5:00:00 PM"})
+    catalog.add({"companyShareId": 1, "issueCloseDate": "2024-04-28 5:00:00 PM"})
+
+    assert catalog.issue(1).issue_close_date == "2024-04-28 5:00:00 PM"
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert [percentile(values, p) for p in (5, 99, 100)] == [5, 99, 100]
+    assert percentile([], 50) == 0
+
+
+def test_parse_at():
+    now = datetime(2024, 4, 25, 10, 30)
+    assert parse_at('11:00', now) == datetime(2024, 4, 25, 11, 0)
+    assert parse_at('10:00', now) == datetime(2024, 4, 26, 10, 0)
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_at('2024-04-25T10:00', now)
@@ -0,0 +1,144 @@
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+import constants
+from profiling import endpoint_name
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# verify=False has always been used against the CDSC backend, don't warn on every single request
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+class TransportStats:
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+
+    def record(self, bytes_sent, bytes_received):
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += bytes_sent
+            self.bytes_received += bytes_received
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+
+class Transport:
+    """
+    HTTP transport shared by every `UserSession`. Connections to the CDSC backend are kept alive and pooled across
+    accounts, requests time out and idempotent requests are retried with exponential backoff on 5xx responses and
+    connection errors.
+    """
+
+    def __init__(self, base_url=constants.API_BASE_URL, pool_size=10, connect_timeout=5, read_timeout=30, retries=3,
+                 backoff_factor=0.5, profiler=None, limiter=None, recorder=None, adapter=None):
+        """
+        :param profiler: optional `profiling.RequestProfiler` recording every request
+        :param limiter: optional `ratelimit.AdaptiveRateLimiter` every request has to go through
+        :param recorder: optional `fixtures.FixtureRecorder` saving every request with its response
+        :param adapter: requests adapter sending the requests, e.g. a `fixtures.ReplayAdapter`, defaults to a pooled
+                        `HTTPAdapter`
+        """
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.stats = TransportStats()
+        self.profiler = profiler
+        self.limiter = limiter
+        self.recorder = recorder
+
+        self.session = requests.Session()
+        self.session.verify = False
+        # the session is shared by all accounts, never carry cookies from one account over to another
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        self.adapter = adapter or HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+
+    def url(self, path):
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def request(self, method, path, retry=True, account=None, limit=True, **kwargs):
+        """
+        :param retry: set to False for requests that must not be sent twice, e.g. applying to an issue
+        :param limit: set to False for requests paced by the caller, they don't wait for the limiter, which still
+                      records their responses
+        :param account: user the request is sent for, only used by the profiler
+        :return: requests.Response
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        endpoint = endpoint_name(method, path)
+        attempts = self.retries + 1 if retry else 1
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            if self.limiter and limit:
+                self.limiter.acquire(endpoint)
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, self.url(path), **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                latency = time.perf_counter() - start
+                if self.limiter:
+                    self.limiter.record(endpoint, type(e).__name__, latency)
+                if self.profiler:
+                    self.profiler.record(method, path, account, type(e).__name__, latency)
+                if last_attempt:
+                    raise
+            else:
+                latency = time.perf_counter() - start
+                bytes_sent, bytes_received = len(response.request.body or b''), len(response.content)
+                self.stats.record(bytes_sent, bytes_received)
+                if self.limiter:
+                    self.limiter.record(endpoint, response.status_code, latency)
+                if self.profiler:
+                    self.profiler.record(method, path, account, response.status_code, latency, bytes_sent,
+                                         bytes_received)
+                if self.recorder:
+                    self.recorder.record(method, path, response)
+                if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                    return response
+
+            self.stats.record_retry()
+            time.sleep(self.backoff_factor * (2 ** attempt))
+
+    @property
+    def connections(self):
+        """
+        :return: tuple of (new connections opened, requests sent over the pooled connections)
+        """
+        opened, sent = 0, 0
+        if not isinstance(self.adapter, HTTPAdapter):
+            return opened, sent
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            opened += pool.num_connections
+            sent += pool.num_requests
+        return opened, sent
+
+    def summary(self):
+        opened, sent = self.connections
+        return (f"{self.stats.requests} requests ({self.stats.retries} retries), "
+                f"{self.stats.bytes_sent} bytes sent, {self.stats.bytes_received} bytes received, "
+                f"{opened} connections opened, {max(sent - opened, 0)} reused")
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,221 @@
+import json
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+
+import constants
+from locks import AccountLock
+
+NEW_ISSUE = 'new_issue'
+CLOSING_SOON = 'closing_soon'
+NEWLY_ALLOTTED = 'newly_allotted'
+AUTO_APPLIED = 'auto_applied'
+
+# "2024-04-25 5:00:00 PM" and "Apr 25, 2024 5:00:00 PM" are both seen in `applicableIssue` responses
+ISSUE_DATE_FORMATS = ('%Y-%m-%d %I:%M:%S %p', '%b %d, %Y %I:%M:%S %p')
+
+
+def parse_issue_date(value):
+    """
+    :return: datetime, None when the date is missing or in an unknown format
+    """
+    for date_format in ISSUE_DATE_FORMATS:
+        try:
+            return datetime.strptime(value or '', date_format)
+        except ValueError:
+            pass
+    return None
+
+
+def issue_event(kind, issue, **fields):
+    return {
+        'event': kind,
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'company_share_id': issue.company_share_id,
+        'scrip': issue.scrip,
+        'company_name': issue.company_name,
+        'share_type': issue.share_type_name,
+        'share_group': issue.share_group_name,
+        'issue_open_date': issue.issue_open_date,
+        'issue_close_date': issue.issue_close_date,
+        **fields
+    }
+
+
+def print_event(event):
+    details = ', '.join(f"{key}: {value}" for key, value in event.items() if key not in ('event', 'time'))
+    print(f"[{event['time']}] {event['event'].upper()}!! -- {details}", flush=True)
+
+
+class JsonlSink:
+    """
+    Appends every event as a JSON line to `path`.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'a')
+
+    def __call__(self, event):
+        self.file.write(json.dumps(event) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class WebhookSink:
+    """
+    POSTs every event as JSON to `url`, a failing webhook is reported and never stops the watcher.
+    """
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def __call__(self, event):
+        try:
+            self.session.post(self.url, json=event, timeout=self.timeout).raise_for_status()
+        except requests.RequestException as e:
+            print(f"WEBHOOK FAILED!! -- {e}", file=sys.stderr)
+
+    def close(self):
+        self.session.close()
+
+
+class IssueWatcher:
+    """
+    Polls the open issues with a single probe session every `interval` seconds, plus or minus `jitter`, and emits an
+    event for every issue that opened since the previous poll and once for every issue closing within
+    `closing_window`. Every `allotment_interval` seconds the applications of all pooled sessions are checked for new
+    allotments. The first poll only records what is already there.
+
+    With `auto_apply_shares`, every new ordinary share IPO is applied to for all pooled sessions, skipping the accounts
+    another run is applying for.
+    """
+
+    def __init__(self, probe, sessions, sinks, interval=60, jitter=10, closing_window=timedelta(hours=24),
+                 allotment_interval=3600, auto_apply_shares=None, workers=4, lock_dir=constants.LOCK_DIRECTORY):
+        """
+        :param probe: logged in `UserSession` polling the open issues
+        :param sessions: logged in `UserSession`s kept alive for the allotment checks and the applications
+        :param sinks: callables every event dict is passed to
+        :param lock_dir: directory of the `locks.AccountLock` files held while applying
+        """
+        self.probe = probe
+        self.sessions = sessions
+        self.sinks = sinks
+        self.interval = interval
+        self.jitter = jitter
+        self.closing_window = closing_window
+        self.allotment_interval = allotment_interval
+        self.auto_apply_shares = auto_apply_shares
+        self.workers = workers
+        self.lock_dir = lock_dir
+        self.issues = None
+        self.closing_notified = set()
+        self.allotment_statuses = {}
+        self._allotments_checked_at = None
+
+    def emit(self, event):
+        for sink in self.sinks:
+            sink(event)
+
+    def poll_issues(self):
+        issues = {issue.company_share_id: issue for issue in self.probe.iter_open_issues()}
+        new_ids = [] if self.issues is None else [company_share_id for company_share_id in issues
+                                                  if company_share_id not in self.issues]
+        self.issues = issues
+
+        for company_share_id in new_ids:
+            self.emit(issue_event(NEW_ISSUE, issues[company_share_id]))
+
+        # notified once per close date, an extended close date is notified again
+        now = datetime.now()
+        for issue in issues.values():
+            close_date = parse_issue_date(issue.issue_close_date)
+            notified_key = (issue.company_share_id, issue.issue_close_date)
+            if (close_date and now <= close_date <= now + self.closing_window
+                    and notified_key not in self.closing_notified):
+                self.closing_notified.add(notified_key)
+                self.emit(issue_event(CLOSING_SOON, issue))
+        self.closing_notified = {key for key in self.closing_notified if key[0] in issues}
+
+        if self.auto_apply_shares:
+            for company_share_id in new_ids:
+                issue = issues[company_share_id]
+                if issue.is_ipo and issue.is_ordinary_shares:
+                    self.auto_apply(issue)
+
+    def auto_apply(self, issue):
+        def _apply(user):
+            with AccountLock(user.account.user, self.lock_dir) as lock:
+                if not lock.acquire():
+                    return f"SKIPPED, another run is applying for this account, {lock.holder()}"
+                return user.apply_many(self.auto_apply_shares, [issue.company_share_id])[issue.company_share_id]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(_apply, user): user for user in self.sessions}
+            for future, user in futures.items():
+                try:
+                    status = future.result()
+                except Exception as e:
+                    status = f"FAILED: {e}"
+                self.emit(issue_event(AUTO_APPLIED, issue, account=user.account.user, status=status))
+
+    def poll_allotments(self):
+        def _statuses(user):
+            return {application.applicant_form_id: application for application in user.generate_reports()}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(_statuses, user): user for user in self.sessions}
+            for future, user in futures.items():
+                try:
+                    applications = future.result()
+                except Exception as e:
+                    print(f"FAILED!! {user.account.user} -- {e}", file=sys.stderr)
+                    continue
+
+                previous = self.allotment_statuses.get(user.account.user)
+                self.allotment_statuses[user.account.user] = {
+                    application_id: application.allotment_status
+                    for application_id, application in applications.items()
+                }
+                if previous is None:
+                    continue
+                for application_id, application in applications.items():
+                    if application.allotment_status == 'Alloted' and previous.get(application_id) != 'Alloted':
+                        self.emit({
+                            'event': NEWLY_ALLOTTED,
+                            'time': datetime.now().isoformat(timespec='seconds'),
+                            'account': user.account.user,
+                            'applicant_form_id': application_id,
+                            'scrip': application.scrip,
+                            'company_name': application.company_name
+                        })
+
+    def poll(self):
+        try:
+            self.poll_issues()
+        except Exception as e:
+            print(f"FAILED!! open issues -- {e}", file=sys.stderr)
+
+        now = time.monotonic()
+        if self._allotments_checked_at is None or now - self._allotments_checked_at >= self.allotment_interval:
+            self._allotments_checked_at = now
+            self.poll_allotments()
+
+    def run(self, polls=None):
+        """
+        Polls until interrupted, or `polls` times.
+        """
+        count = 0
+        while polls is None or count < polls:
+            self.poll()
+            count += 1
+            if polls is None or count < polls:
+                time.sleep(max(self.interval + random.uniform(-self.jitter, self.jitter), 1))